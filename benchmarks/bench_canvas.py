@@ -0,0 +1,169 @@
+"""Listing, tile and geometry paths of the canvas collections.
+
+Builds a synthetic local bucket (<zone>/<quadkey>/<catid>-<n>.tif, empty
+files) so no S3 access is needed, then times each stage on it:
+
+    python -m benchmarks.bench_canvas --tiles 5000 --catids 50 -o canvas.json
+"""
+import io
+import os
+import random
+import shutil
+import argparse
+import tempfile
+
+import tiletanic as tt
+import shapely.geometry as geom
+
+from skyway.canvas import CanvasCollection, CoverageIndex, TileArray, WORLD_CRS
+from skyway.query.query import GeomQueryBuilder
+from skyway.query.filters import TagFilter
+from skyway.query.batch import TileBatchQuery
+
+from .common import measured, timed, report
+
+
+def make_bucket(root, zones=(19,), tiles=1000, catids=50, per_tile=(1, 3), fill=0.8,
+                tilescheme="WNUTM5kmTiling", seed=0):
+    # A local canvas bucket under root: per zone, `tiles` quadkeys scattered
+    # over a square block holding tiles / fill cells north of the equator,
+    # each with per_tile (min, max) COGs drawn from `catids` catalog ids.
+    # Returns {zone: [quadkeys]}.
+    rnd = random.Random(seed)
+    tiler = getattr(tt.tileschemes, tilescheme)()
+    zoom = tiler.zoom
+    names = [f'''{rnd.getrandbits(64):016X}''' for _ in range(catids)]
+    side = max(1, int((tiles / fill) ** 0.5) + 1)
+    layout = dict()
+    for zone in zones:
+        x0, y0 = tiler._x(500000 - side * tiler.tile_size / 2, zoom), tiler._y(4500000, zoom)
+        cells = rnd.sample(range(side * side), min(tiles, side * side))
+        quadkeys = sorted(tiler.quadkey(tt.base.Tile(x0 + c % side, y0 + c // side, zoom)) for c in cells)
+        for qk in quadkeys:
+            qk_dir = os.path.join(root, str(zone), qk)
+            os.makedirs(qk_dir, exist_ok=True)
+            for catid in rnd.sample(names, rnd.randint(*per_tile)):
+                open(os.path.join(qk_dir, f'''{catid}-{rnd.randint(0, 9)}.tif'''), 'w').close()
+        layout[zone] = quadkeys
+    return layout
+
+
+def _stage(name, fn, items, repeat):
+    best, _ = timed(fn, repeat=repeat)
+    return {"stage": name, "best_s": best, "items": items,
+            "per_item_us": best / items * 1e6 if items else None}
+
+
+def run(root, zone, args):
+    stages = []
+    tilescheme = getattr(tt.tileschemes, args.tilescheme)
+
+    def collection():
+        return CanvasCollection(bucket=root, tilescheme=tilescheme, max_workers=args.workers)
+
+    # Listing: the zone directory, then every quadkey directory
+    stages.append(_stage("list_quadkeys", lambda: collection().zone(zone).tile_quadkeys,
+                         args.tiles, args.repeat))
+    stages.append(_stage("list_cogs", lambda: collection().zone(zone).tile_cogs,
+                         args.tiles, args.repeat))
+    stages.append(_stage("stats", lambda: collection().stats(), args.tiles * len(args.zones), args.repeat))
+
+    tc = collection().zone(zone)
+    tc.tile_cogs
+    edges = tc.index.edges()
+
+    def graph():
+        index = CoverageIndex()
+        index.add_edges(edges)
+        return index.graph()
+    stages.append(_stage("graph_build", graph, len(edges), args.repeat))
+
+    quadkeys = tc.tile_quadkeys
+    tiles = tc.tiles
+    raw = tiles._tiles
+
+    def fresh():
+        # A TileArray without cached bounds or rings
+        return TileArray(raw, tiler=tc.tiler)
+    stages.append(_stage("tiles_from_quadkeys",
+                         lambda: TileArray.from_quadkeys(quadkeys, tiler=tc.tiler).sorted(),
+                         len(quadkeys), args.repeat))
+    stages.append(_stage("quadkeys_from_tiles", lambda: fresh().quadkeys, len(raw), args.repeat))
+    stages.append(_stage("iterate_geotiles", lambda: sum(1 for _ in fresh()), len(raw), args.repeat))
+    stages.append(_stage("reproject_rings", lambda: fresh().rings(WORLD_CRS), len(raw), args.repeat))
+    sample = min(len(raw), 1000)
+    stages.append(_stage("reproject_geotiles", lambda: [t.toWGS84() for t in fresh()[:sample]],
+                         sample, args.repeat))
+    stages.append(_stage("coverage_union", lambda: fresh().footprint(WORLD_CRS), len(raw), args.repeat))
+
+    # AOI lookup: a box over the middle quarter of the zone's tiles, grid
+    # index included
+    bounds = tiles.bounds(WORLD_CRS)
+    w, s = bounds[:, :2].min(axis=0).tolist()
+    e, n = bounds[:, 2:].max(axis=0).tolist()
+    aoi = geom.box(w + (e - w) / 4, s + (n - s) / 4, e - (e - w) / 4, n - (n - s) / 4)
+
+    def lookup():
+        tc._grid = None
+        return tc.tiles_intersecting(aoi)
+    stages.append(_stage("aoi_lookup", lookup, len(raw), args.repeat))
+
+    # QL generation: a fresh builder per round, and one batched script over
+    # every tile of the zone
+    def builder():
+        gb = GeomQueryBuilder(bbox=(40.0, -70.1, 40.1, -70.0))
+        for k in range(args.filters):
+            gb.query.add_tagfilter(TagFilter(f'''key{k}''', vals=[f'''v{k}''', f'''w{k}''']))
+        return gb
+    stages.append(_stage("ql_single", lambda: builder().ql(), args.filters, args.repeat))
+    gb = builder()
+    stages.append(_stage("ql_batch", lambda: TileBatchQuery(gb, fresh()).ql(), len(raw), args.repeat))
+
+    stages.append(_stage("export_ndjson", lambda: tc.export(io.BytesIO(), fmt='ndjson'),
+                         len(raw), args.repeat))
+
+    mem = dict()
+    with measured(mem):
+        c = collection().zone(zone)
+        c.tile_cogs
+        c.__geo_interface__
+    stages.append({"stage": "list_and_footprint_traced", "best_s": mem["wall_s"], "items": args.tiles,
+                   "peak_mem_bytes": mem["peak_mem_bytes"]})
+    for stage in stages:
+        stage["zone"] = zone
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiles", type=int, default=2000, help="quadkeys per zone")
+    parser.add_argument("--catids", type=int, default=50)
+    parser.add_argument("--zones", type=int, nargs="+", default=[19])
+    parser.add_argument("--fill", type=float, default=0.8)
+    parser.add_argument("--tilescheme", default="WNUTM5kmTiling")
+    parser.add_argument("--filters", type=int, default=8, help="tag filters in the QL stages")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bucket", default=None, help="build the bucket here and keep it")
+    parser.add_argument("-o", "--output", default="-")
+    args = parser.parse_args(argv)
+
+    params = vars(args).copy()
+    params.pop("output")
+    params.pop("bucket")
+    root = args.bucket or tempfile.mkdtemp(prefix="skyway-bench-")
+    try:
+        make_bucket(root, zones=args.zones, tiles=args.tiles, catids=args.catids, fill=args.fill,
+                    tilescheme=args.tilescheme, seed=args.seed)
+        results = []
+        for zone in args.zones:
+            results.extend(run(root, zone, args))
+    finally:
+        if args.bucket is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return report("canvas", params, results, output=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Throughput, tail latency and peak memory of the Overpass query paths.
+
+Runs every scenario against a local OverpassStandin so nothing touches the
+public servers:
+
+    python -m benchmarks.bench_query --elements 5000 --latency 0.02 -o query.json
+"""
+import argparse
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from skyway.query.query import GeomQueryBuilder
+from skyway.query.filters import TagFilter
+from skyway.query.client import OverpassClient
+from skyway.query.cache import ResponseCache
+from skyway.query.executor import SplitQueryExecutor
+from skyway.query.standin import StandinProcess
+
+from .common import latency_summary, measured, report
+
+
+def _builder(bbox=(40.0, -70.1, 40.1, -70.0)):
+    gb = GeomQueryBuilder(bbox=bbox)
+    gb.query.add_tagfilter(TagFilter("highway", vals=["primary", "secondary"]))
+    return gb
+
+
+def _request_json(client, gb):
+    return len(gb.request(client=client).json()["elements"])
+
+
+def _features_stream(client, gb):
+    return sum(1 for _ in gb.features(client=client))
+
+
+def _split_executor(client, gb):
+    return sum(1 for _ in SplitQueryExecutor(client=client, max_workers=4, max_span=0.05).run(gb))
+
+
+SCENARIOS = {
+    "request_json": (_request_json, False),
+    "features_stream": (_features_stream, False),
+    "cached_request_json": (_request_json, True),
+    "split_executor": (_split_executor, False),
+}
+
+
+def _drive(fn, client, gb, requests, concurrency):
+    latencies, failures = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            fn(client, gb)
+        except Exception:
+            with lock:
+                failures += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return latencies, failures
+
+
+def run_scenario(name, endpoint, requests, concurrency, client_kwargs):
+    # Throughput and latency come from an untraced run; peak memory from a
+    # second, traced run of one request per worker since tracemalloc slows
+    # allocation heavy code by an order of magnitude
+    fn, cached = SCENARIOS[name]
+    cache = ResponseCache(path=None) if cached else None
+    client = OverpassClient(endpoint, cache=cache, **client_kwargs)
+    gb = _builder()
+    result = {"scenario": name, "requests": requests, "concurrency": concurrency}
+    start = time.perf_counter()
+    latencies, failures = _drive(fn, client, gb, requests, concurrency)
+    result["wall_s"] = time.perf_counter() - start
+    result["failures"] = failures
+    result["requests_per_s"] = len(latencies) / result["wall_s"] if result["wall_s"] else None
+    result.update(latency_summary(latencies))
+    if cache is not None:
+        result["cache"] = cache.stats
+    mem = dict()
+    with measured(mem):
+        _drive(fn, client, gb, concurrency, concurrency)
+    result["peak_mem_bytes"] = mem["peak_mem_bytes"]
+    client.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--elements", type=int, default=2000, help="standin elements per 0.1 degree box")
+    parser.add_argument("--way-nodes", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-504", type=float, default=0.0)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("-o", "--output", default="-")
+    args = parser.parse_args(argv)
+
+    params = vars(args).copy()
+    params.pop("output")
+    error_rate = {429: args.rate_429, 504: args.rate_504}
+    client_kwargs = {"backoff": 0.01, "max_backoff": 0.1}
+    results = []
+    with StandinProcess(elements=args.elements, way_nodes=args.way_nodes, latency=args.latency,
+                         jitter=args.jitter, error_rate=error_rate) as srv:
+        for name in args.scenarios:
+            results.append(run_scenario(name, srv.endpoint, args.requests, args.concurrency, client_kwargs))
+    return report("query", params, results, output=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import sys
+import json
+import time
+import platform
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    k = (len(samples) - 1) * p / 100.
+    lo = int(k)
+    hi = min(lo + 1, len(samples) - 1)
+    return samples[lo] + (samples[hi] - samples[lo]) * (k - lo)
+
+
+def latency_summary(samples):
+    return {"mean_s": sum(samples) / len(samples) if samples else None,
+            "p50_s": percentile(samples, 50),
+            "p95_s": percentile(samples, 95),
+            "p99_s": percentile(samples, 99),
+            "max_s": max(samples) if samples else None}
+
+
+@contextmanager
+def measured(result):
+    # Fills result with wall time and peak traced python memory of the block
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["wall_s"] = time.perf_counter() - start
+        result["peak_mem_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+
+def timed(fn, repeat=5):
+    # Best-of-repeat wall time of fn() plus the last return value
+    best, value = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def report(suite, params, results, output=None):
+    # One machine readable document per run, comparable across commits
+    doc = {"suite": suite,
+           "commit": git_revision(),
+           "python": platform.python_version(),
+           "platform": platform.platform(),
+           "timestamp": time.time(),
+           "params": params,
+           "results": results}
+    text = json.dumps(doc, indent=2, sort_keys=True)
+    if output is None or output == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return doc
@@ -14,7 +14,7 @@ setup(name="skyway",
       description="Python API for making OSM queries",
       url="",
       license="MIT",
-      packages=find_packages(exclude=['docs', 'tests']),
+      packages=find_packages(exclude=['docs', 'tests', 'benchmarks', 'benchmarks.*']),
       install_require=reqs,
       python_requires='>3.7',
       )
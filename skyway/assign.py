@@ -0,0 +1,152 @@
+import os
+import json
+
+import numpy as np
+import shapely.ops as ops
+import shapely.geometry as geom
+from shapely.prepared import prep
+try:
+    from shapely import STRtree as _STRtree, transform as _transform
+    from shapely import intersection as _intersection, box as _box, get_dimensions as _dimensions
+except ImportError: # shapely < 2 has no bulk queries; fall back to the grid index
+    _STRtree = None
+    _transform = None
+
+from . import metrics
+from .canvas import WORLD_CRS
+from .projection import get_transformer
+
+
+def _feature_parts(feature):
+    # (tags, shapely geometry) from a query Element or a GeoJSON feature
+    if isinstance(feature, dict):
+        return feature.get("properties") or {}, geom.shape(feature["geometry"])
+    return feature.tags, feature.geometry
+
+
+def reproject(shapes, src_crs, to_crs):
+    # Reproject a list of geometries with a single transform call
+    tr = get_transformer(src_crs, to_crs)
+    with metrics.span('geom.transform'):
+        if _transform is not None:
+            return list(_transform(np.asarray(shapes, dtype=object),
+                                   lambda c: np.column_stack(tr.transform(c[:, 0], c[:, 1]))))
+        return [ops.transform(tr.transform, s) for s in shapes]
+
+
+def _properties(feature, tags):
+    props = dict(tags)
+    if not isinstance(feature, dict):
+        props["osm_type"], props["osm_id"] = feature.type, feature.id
+    return props
+
+
+class TileAssigner(object):
+    # Assigns features to every tile of a TileCollection they touch. One
+    # STRtree over the tile boxes is built per hemisphere crs, all features
+    # are reprojected and queried against it in bulk, and only the resulting
+    # candidate pairs are clipped. Output is grouped and yielded one tile at
+    # a time.
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._trees = dict()
+
+    def _tree(self, mask, utm_crs):
+        if utm_crs not in self._trees:
+            idx = np.flatnonzero(mask)
+            self._trees[utm_crs] = (_STRtree(self.collection.tiles[idx].geoms()), idx)
+        return self._trees[utm_crs]
+
+    def _query(self, mask, utm_crs, projected):
+        if _STRtree is not None:
+            tree, idx = self._tree(mask, utm_crs)
+            fi, ti = tree.query(projected, predicate="intersects")
+            return fi, idx[ti]
+        tiles, grid = self.collection.tiles, self.collection.grid_index
+        fi, ti = [], []
+        for i, shape in enumerate(projected):
+            cand = grid.query(shape.bounds)
+            cand = cand[mask[cand]]
+            pshape = prep(shape)
+            for t, box in zip(cand.tolist(), tiles[cand].geoms()):
+                if pshape.intersects(box):
+                    fi.append(i)
+                    ti.append(t)
+        return np.asarray(fi, dtype=np.intp), np.asarray(ti, dtype=np.intp)
+
+    def pairs(self, shapes, crs=WORLD_CRS):
+        # Per hemisphere crs of the zone, yield (utm_crs, projected shapes,
+        # feature indices, tile indices) for every intersecting pair, sorted
+        # by tile
+        for mask, utm_crs in self.collection.tiles._hemispheres():
+            projected = shapes if crs == utm_crs else reproject(shapes, crs, utm_crs)
+            projected = np.asarray(projected, dtype=object)
+            fi, ti = self._query(mask, utm_crs, projected)
+            order = np.lexsort((fi, ti))
+            yield utm_crs, projected, fi[order], ti[order]
+
+    def assign(self, features, crs=WORLD_CRS, to_crs=WORLD_CRS, clip=True):
+        # Yield (tile index, [(feature, geometry)]) for every tile touched by
+        # a feature. Geometries are clipped to the tile unless clip is False,
+        # and returned in to_crs (None keeps the zone's UTM crs). Clips that
+        # only graze the tile edge, eg a polygon reduced to a line, are dropped.
+        features = list(features)
+        shapes = [_feature_parts(f)[1] for f in features]
+        bounds = self.collection.tiles.utm_bounds
+        for utm_crs, projected, fi, ti in self.pairs(shapes, crs):
+            if not len(ti):
+                continue
+            starts = np.flatnonzero(np.r_[True, ti[1:] != ti[:-1]])
+            for s, e in zip(starts.tolist(), np.r_[starts[1:], len(ti)].tolist()):
+                t = int(ti[s])
+                members = fi[s:e]
+                geoms = projected[members]
+                if clip:
+                    clipped = self._clip(geoms, bounds[t])
+                    keep = [k for k, g in enumerate(clipped) if g is not None]
+                    members, geoms = members[keep], [clipped[k] for k in keep]
+                if to_crs is not None and to_crs != utm_crs and len(geoms):
+                    geoms = reproject(list(geoms), utm_crs, to_crs)
+                yield t, [(features[i], g) for i, g in zip(members.tolist(), geoms)]
+
+    @staticmethod
+    def _clip(geoms, bounds):
+        if _STRtree is not None:
+            clipped = _intersection(geoms, _box(*bounds))
+            full = _dimensions(geoms) == _dimensions(clipped)
+            return [g if ok and not g.is_empty else None for g, ok in zip(clipped, full)]
+        box = geom.box(*bounds)
+        out = []
+        for g in geoms:
+            c = g.intersection(box)
+            out.append(None if c.is_empty or c.geom_type.lstrip("Multi") != g.geom_type.lstrip("Multi") else c)
+        return out
+
+    def geojson(self, features, crs=WORLD_CRS, clip=True):
+        # Yield (quadkey, FeatureCollection) per touched tile, in WGS84. Each
+        # feature carries its tags plus the tile properties of to_gjson.
+        tiles = self.collection.tiles
+        quadkeys = tiles.quadkeys
+        zone = self.collection.utm_zone
+        for t, assigned in self.assign(features, crs=crs, to_crs=WORLD_CRS, clip=clip):
+            tile_props = {"tile_id": "+".join([str(zone), quadkeys[t]]),
+                          "ix": int(tiles.ix[t]),
+                          "iy": int(tiles.iy[t]),
+                          "zoom": int(tiles.zoom[t])}
+            collection = []
+            for feature, g in assigned:
+                props = _properties(feature, _feature_parts(feature)[0])
+                props.update(tile_props)
+                collection.append({"type": "Feature", "properties": props, "geometry": geom.mapping(g)})
+            yield quadkeys[t], {"type": "FeatureCollection", "features": collection}
+
+    def write_geojson(self, features, out_dir, crs=WORLD_CRS, clip=True):
+        # Write <out_dir>/<quadkey>.geojson per touched tile, yielding
+        # (quadkey, path) as each is written
+        os.makedirs(out_dir, exist_ok=True)
+        for quadkey, fc in self.geojson(features, crs=crs, clip=clip):
+            path = os.path.join(out_dir, f'''{quadkey}.geojson''')
+            with open(path, "w") as f:
+                json.dump(fc, f)
+            yield quadkey, path
@@ -7,7 +7,11 @@ import datetime
 from functools import partial, partialmethod
 import types
 import dataclasses
+import itertools
+import collections
+from array import array
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import boto3
 import botocore
@@ -19,20 +23,45 @@ import rasterio
 from rasterio.plot import show as rashow
 import shapely.ops as ops
 import shapely.geometry as geom
-from pyproj import CRS, Proj, Transformer
+from shapely.prepared import prep
+from pyproj import CRS, Proj
+try:
+    from shapely import polygons as _polygons
+except ImportError: # shapely < 2 has no vectorized constructors
+    _polygons = None
 
 import tiletanic as tt
 import canvas
 
-from .utils import itrreduce, to_gjson
+from . import metrics
+from .utils import to_gjson
+from .raster import DatasetPool
+from .projection import transformer
+from .quadkey import codec as _codec, key_children, key_parent, key_zoom
 
 WORLD_CRS = CRS.from_epsg(4326)
 MAP_CRS = CRS.from_epsg(3857)
 
+Chip = collections.namedtuple('Chip', ['image', 'bounds', 'quadkey', 'catid'])
+
+# One row of CanvasCollection.stats: counts, covered area in m^2 and the
+# number of catalog ids per quadkey (coverage depth). tile_catids counts
+# distinct (quadkey, catalog id) pairs, not COG files, which zones loaded from
+# a manifest have not listed.
+ZONE_STATS = np.dtype([('zone', 'i2'), ('quadkeys', 'i8'), ('catids', 'i8'), ('tile_catids', 'i8'),
+                       ('covered', 'i8'), ('area', 'f8'), ('depth_mean', 'f8'), ('depth_max', 'i4')])
+
 
 # Bounds are always (lonmin, latmin, lonmax, latmax) from shit
 # eg (xmin, ymin, xmax, ymax)
 
+
+def is_north(iy, zoom):
+    # The first quadkey digit is 0 or 1 when the top bit of iy is clear, ie
+    # for tiles in the northern half of the zone. Works on scalars and arrays.
+    return (np.right_shift(iy, np.subtract(zoom, 1)) & 1) == 0
+
+
 class GeoTileTransformer(object):
     def __init__(self, tile, to_crs):
         self.tile = tile
@@ -62,15 +91,14 @@ class GeoTile(object):
         self.zoom = zoom
         self._tiler = tiler
         self._qk = None
-        if self.quadkey[0] in ('0', '1'):
+        if is_north(yi, zoom):
             self.__crs__ = tiler._crs_n
-            self._tr = tiler._tr_n
         else:
             self.__crs__ = tiler._crs_s
-            self._tr = tiler._tr_s
         self._crs = self.__crs__
-        self.__gi__ = geom.box(*self.utm_bounds).__geo_interface__
-        self._gi = self.__gi__
+        # Footprints are built lazily; most tiles are never asked for one
+        self.__gi__ = None
+        self._gi = None
 
     @property
     def utm_zone(self):
@@ -101,11 +129,8 @@ class GeoTile(object):
         self._crs = to_crs
         if ccrs == to_crs:
             return
-        if ccrs == self.__crs__ and to_crs == WORLD_CRS:
-            tr = self._tr
-        else:
-            tr = Transformer.from_crs(ccrs, to_crs, always_xy=True).transform
-        self._gi = ops.transform(tr, geom.shape(self)).__geo_interface__
+        with metrics.span('geom.transform'):
+            self._gi = ops.transform(transformer(ccrs, to_crs), geom.shape(self)).__geo_interface__
 
     toWGS84 = partialmethod(set_crs, WORLD_CRS)
 
@@ -131,6 +156,10 @@ class GeoTile(object):
 
     @property
     def __geo_interface__(self):
+        if self._gi is None:
+            if self.__gi__ is None:
+                self.__gi__ = geom.box(*self.utm_bounds).__geo_interface__
+            self._gi = self.__gi__
         return self._gi
 
     @classmethod
@@ -151,6 +180,235 @@ class GeoTile(object):
 
 
 
+def _densify_ring(coords, step):
+    coords = np.asarray(coords)[:, :2]
+    seg = coords[1:] - coords[:-1]
+    n = np.maximum(np.ceil(np.hypot(seg[:, 0], seg[:, 1]) / step).astype(int), 1)
+    frac = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / np.repeat(n, n)
+    pts = np.repeat(coords[:-1], n, axis=0) + np.repeat(seg, n, axis=0) * frac[:, None]
+    return np.concatenate([pts, coords[-1:]])
+
+
+def _densify(shape, step):
+    if shape.is_empty:
+        return shape
+    if shape.geom_type == 'MultiPolygon':
+        return geom.MultiPolygon([_densify(p, step) for p in shape.geoms])
+    return geom.Polygon(_densify_ring(shape.exterior.coords, step),
+                        [_densify_ring(r.coords, step) for r in shape.interiors])
+
+
+
+class TileArray(object):
+    # Struct-of-arrays stand-in for a sequence of GeoTiles. Bounds and
+    # reprojections are computed for every tile at once; GeoTile objects are
+    # only built when a single tile is indexed or iterated.
+
+    def __init__(self, tiles, tiler=None):
+        if isinstance(tiles, np.ndarray) and tiles.dtype.names is not None:
+            tiles = tiles.astype(GeoTile.dtype, copy=False)
+        else:
+            tiles = np.array([tuple(t) for t in tiles], dtype=GeoTile.dtype)
+        self._tiles = tiles
+        self._tiler = tiler
+        self._utm_bounds = None
+        self._rings = dict()
+        self._keys = None
+
+    @classmethod
+    def from_quadkeys(cls, quadkeys, tiler=None):
+        return cls.from_keys(tiler.codec.from_strings(quadkeys), tiler=tiler)
+
+    @classmethod
+    def from_keys(cls, keys, tiler=None):
+        keys = np.asarray(keys, dtype=np.int64)
+        tiles = np.empty(len(keys), dtype=GeoTile.dtype)
+        tiles['ix'], tiles['iy'], tiles['zoom'] = tiler.codec.decode(keys)
+        arr = cls(tiles, tiler=tiler)
+        arr._keys = keys
+        return arr
+
+    @property
+    def keys(self):
+        # int64 quadkeys, see skyway.quadkey
+        if self._keys is None:
+            self._keys = self._tiler.codec.encode(self.ix, self.iy, self.zoom)
+        return self._keys
+
+    @property
+    def ix(self):
+        return self._tiles['ix']
+
+    @property
+    def iy(self):
+        return self._tiles['iy']
+
+    @property
+    def zoom(self):
+        return self._tiles['zoom']
+
+    @property
+    def north(self):
+        return is_north(self.iy, self.zoom)
+
+    def _hemispheres(self):
+        north = self.north
+        for mask, crs in ((north, self._tiler._crs_n), (~north, self._tiler._crs_s)):
+            if mask.any():
+                yield mask, crs
+
+    def _transformer(self, src_crs, to_crs):
+        return transformer(src_crs, to_crs)
+
+    def sorted(self, order=('iy', 'ix')):
+        # By the given fields, then the rest, like np.sort; order='key' sorts
+        # by integer quadkey, ie depth first with parents ahead of children
+        if order == 'key':
+            return self[np.argsort(self.keys, kind='stable')]
+        fields = list(order) + [f for f in self._tiles.dtype.names if f not in order]
+        return self[np.lexsort([self._tiles[f] for f in reversed(fields)])]
+
+    @property
+    def utm_bounds(self):
+        # (N, 4) array of (xmin, ymin, xmax, ymax). The tiler coordinate
+        # functions are plain arithmetic so they broadcast over arrays; taking
+        # min/max of the row edges keeps this correct for both top-left and
+        # bottom-left origin schemes.
+        if self._utm_bounds is None:
+            scheme = self._tiler._tiler
+            ix, iy, zoom = self.ix, self.iy, self.zoom
+            x0, x1 = scheme._xcoord(ix, zoom), scheme._xcoord(ix + 1, zoom)
+            y0, y1 = scheme._ycoord(iy, zoom), scheme._ycoord(iy + 1, zoom)
+            self._utm_bounds = np.column_stack([x0, np.minimum(y0, y1),
+                                                x1, np.maximum(y0, y1)])
+        return self._utm_bounds
+
+    def utm_rings(self):
+        # (N, 5, 2) closed exterior rings in the same vertex order as geom.box
+        xmin, ymin, xmax, ymax = self.utm_bounds.T
+        xs = np.column_stack([xmax, xmax, xmin, xmin, xmax])
+        ys = np.column_stack([ymin, ymax, ymax, ymin, ymin])
+        return np.stack([xs, ys], axis=-1)
+
+    def rings(self, to_crs=WORLD_CRS):
+        # Reproject every ring with one transform call per hemisphere
+        if to_crs in self._rings:
+            return self._rings[to_crs]
+        rings = self.utm_rings()
+        for mask, src_crs in self._hemispheres():
+            if src_crs == to_crs:
+                continue
+            tr = self._transformer(src_crs, to_crs)
+            sub = rings[mask]
+            with metrics.span('geom.transform'):
+                xs, ys = tr(sub[..., 0].ravel(), sub[..., 1].ravel())
+            rings[mask] = np.stack([xs, ys], axis=-1).reshape(sub.shape)
+        self._rings[to_crs] = rings
+        return rings
+
+    def geoms(self, to_crs=None):
+        rings = self.utm_rings() if to_crs is None else self.rings(to_crs)
+        if _polygons is not None:
+            return list(_polygons(rings))
+        return [geom.Polygon(ring) for ring in rings]
+
+    def bounds(self, to_crs=WORLD_CRS):
+        rings = self.rings(to_crs)
+        return np.column_stack([rings[..., 0].min(axis=1), rings[..., 1].min(axis=1),
+                                rings[..., 0].max(axis=1), rings[..., 1].max(axis=1)])
+
+    def merged(self):
+        # Collapse every complete set of four siblings into its parent, bottom
+        # up, so a solid block of tiles becomes a handful of coarse ones. Zoom 1
+        # is the floor since its tiles are the two hemispheres.
+        keys = np.unique(self.keys)
+        if not len(keys):
+            return self
+        zoom = key_zoom(keys)
+        keep = [keys[zoom < 1]]
+        carry = keys[:0]
+        for z in range(zoom.max(), 0, -1):
+            level = np.unique(np.concatenate([keys[zoom == z], carry]))
+            if z == 1:
+                keep.append(level)
+                break
+            uniq, inv, counts = np.unique(key_parent(level), return_inverse=True, return_counts=True)
+            full = counts == 4
+            keep.append(level[~full[inv.ravel()]])
+            carry = uniq[full]
+        return self.__class__.from_keys(np.concatenate(keep), tiler=self._tiler)
+
+    def footprint(self, to_crs=WORLD_CRS):
+        # Union the merged tiles in their native UTM crs with one bulk union
+        # per hemisphere, then reproject only the outline. The outline is
+        # densified to the finest tile edge first so every grid corner on it
+        # is reprojected, the same vertices the per-tile union used to keep.
+        if not len(self):
+            return geom.Polygon()
+        merged = self.merged()
+        bounds = self.utm_bounds
+        step = (bounds[:, 2] - bounds[:, 0]).min()
+        parts = []
+        for mask, src_crs in merged._hemispheres():
+            with metrics.span('geom.unary_union'):
+                shape = ops.unary_union(merged[mask].geoms())
+            if to_crs is not None and to_crs != src_crs:
+                with metrics.span('geom.transform'):
+                    shape = ops.transform(self._transformer(src_crs, to_crs),
+                                          _densify(shape, step))
+            parts.append(shape)
+        if len(parts) == 1:
+            return parts[0]
+        with metrics.span('geom.unary_union'):
+            return ops.unary_union(parts)
+
+    @property
+    def quadkeys(self):
+        return self._tiler.codec.to_strings(self.keys)
+
+    def descendants(self, zoom):
+        # (descendants, parents): every tile's descendants at zoom, parent by
+        # parent in row-major order, and the index of each one's parent
+        depth = zoom - self.zoom
+        if len(self) and (depth.min() < 0 or depth.min() != depth.max()):
+            raise ValueError(f'''Tiles must all be at or above zoom {zoom} and share a zoom level''')
+        depth = int(depth[0]) if len(self) else 0
+        side = 2**depth
+        dy, dx = np.divmod(np.arange(side * side), side)
+        tiles = np.empty((len(self), side * side), dtype=GeoTile.dtype)
+        tiles['ix'] = self.ix[:, None] * side + dx
+        tiles['iy'] = self.iy[:, None] * side + dy
+        tiles['zoom'] = zoom
+        parents = np.repeat(np.arange(len(self)), side * side)
+        return self.__class__(tiles.ravel(), tiler=self._tiler), parents
+
+    def tile(self, i):
+        x, y, z = self._tiles[i].tolist()
+        return GeoTile(x, y, z, tiler=self._tiler)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self.tile(item)
+        arr = self.__class__(self._tiles[item], tiler=self._tiler)
+        if self._keys is not None:
+            arr._keys = self._keys[item]
+        return arr
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.tile(i)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self._tiles
+        return self._tiles.astype(dtype)
+
+
+
+
 
 class ProjectedUTMTiling(object):
 
@@ -162,8 +420,18 @@ class ProjectedUTMTiling(object):
         self._tf = partial(GeoTile._from_tile, tiler=self)
         self._crs_n = CRS.from_epsg(f'326{self.utm_zone:02d}')
         self._crs_s = CRS.from_epsg(f'327{self.utm_zone:02d}')
-        self._tr_n = Transformer.from_crs(self._crs_n, WORLD_CRS, always_xy=True).transform
-        self._tr_s = Transformer.from_crs(self._crs_s, WORLD_CRS, always_xy=True).transform
+
+    @property
+    def codec(self):
+        return _codec(self._tiler)
+
+    @property
+    def _tr_n(self):
+        return transformer(self._crs_n, WORLD_CRS)
+
+    @property
+    def _tr_s(self):
+        return transformer(self._crs_s, WORLD_CRS)
 
     def tile_from_xy(self, xcoord, ycoord, zoom=12):
         tile = self._tiler.tile(xcoord, ycoord, zoom)
@@ -177,15 +445,17 @@ class ProjectedUTMTiling(object):
         return self._tiler.quadkey(*tile)
 
     def tile_parent(self, *tile):
-        tile = self._tiler.parent(*tile)
-        return self._tf(tile)
+        ix, iy, zoom = tile[0] if len(tile) == 1 else tile
+        key = key_parent(self.codec.encode(ix, iy, zoom))
+        return self._tf(tt.base.Tile(*[int(v) for v in self.codec.decode(key)]))
 
     def tile_children(self, *tile):
-        children = self._tiler.children(*tile)
-        return [self._tf(tile) for tile in children]
+        ix, iy, zoom = tile[0] if len(tile) == 1 else tile
+        keys = key_children(self.codec.encode([ix], [iy], zoom))[0]
+        return [self._tf(tt.base.Tile(*t)) for t in zip(*[v.tolist() for v in self.codec.decode(keys)])]
 
     def tile_length_at_zoom(self, zoom_level):
-        return self._tiling_physical_length / 2**(zoom_level - self._tiling_zoom_level)
+        return self._tiling_physical_length / 2.0 ** (zoom_level - self._tiling_zoom_level)
 
     def zoom_from_tile_dim(self, dimension):
         pass
@@ -198,22 +468,410 @@ class ProjectedUTMTiling(object):
 
 
 
+class TileGridIndex(object):
+    # Spatial index over a TileArray. Tiles are kept per zoom as a sorted array
+    # of (iy << 32 | ix) keys, so the tiles under a bbox are found with one
+    # pair of binary searches per grid row it spans instead of a full scan.
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self._levels = dict()
+        for z in np.unique(tiles.zoom).tolist():
+            idx = np.flatnonzero(tiles.zoom == z)
+            keys = tiles.iy[idx].astype(np.int64) << 32 | tiles.ix[idx]
+            order = np.argsort(keys)
+            self._levels[z] = (keys[order], idx[order])
+
+    def query(self, bounds):
+        # Indices of tiles whose cell overlaps bounds, given as (xmin, ymin,
+        # xmax, ymax) in tiler coordinates
+        xmin, ymin, xmax, ymax = bounds
+        scheme = self.tiles._tiler._tiler
+        hits = []
+        for z, (keys, idx) in self._levels.items():
+            top = 2**z - 1
+            x0, x1 = max(scheme._x(xmin, z), 0), min(scheme._x(xmax, z), top)
+            ya, yb = scheme._y(ymin, z), scheme._y(ymax, z)
+            y0, y1 = max(min(ya, yb), 0), min(max(ya, yb), top)
+            if x0 > x1 or y0 > y1:
+                continue
+            if y1 - y0 + 1 > len(keys):
+                rows = keys >> 32
+                cols = keys & 0xFFFFFFFF
+                hits.append(idx[(rows >= y0) & (rows <= y1) & (cols >= x0) & (cols <= x1)])
+                continue
+            rows = np.arange(y0, y1 + 1, dtype=np.int64) << 32
+            lo = np.searchsorted(keys, rows | x0)
+            hi = np.searchsorted(keys, rows | x1, side='right')
+            hits.extend(idx[l:h] for l, h in zip(lo.tolist(), hi.tolist()) if h > l)
+        if not hits:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(hits)
+
+
+
+class CoverageIndex(object):
+    # Quadkey <-> catalog id coverage. Both kinds of key are interned to dense
+    # integer codes in insertion order, giving O(1) membership and counts.
+    # Edges are appended as packed int64 (qk_code << 32 | cat_code) and
+    # compiled on demand into CSR adjacency in both directions.
+
+    def __init__(self):
+        self.quadkeys = []
+        self.catids = []
+        self._qk_lut = dict()
+        self._cat_lut = dict()
+        self._edges = array('q')
+        self._csr = None
+        self._graph = None
+
+    def _changed(self):
+        self._csr = None
+        self._graph = None
+
+    def add_quadkey(self, qk):
+        code = self._qk_lut.get(qk)
+        if code is None:
+            code = self._qk_lut[qk] = len(self.quadkeys)
+            self.quadkeys.append(qk)
+            self._changed()
+        return code
+
+    def add_catid(self, catid):
+        code = self._cat_lut.get(catid)
+        if code is None:
+            code = self._cat_lut[catid] = len(self.catids)
+            self.catids.append(catid)
+            self._changed()
+        return code
+
+    def add_edge(self, qk, catid):
+        self._edges.append(self.add_quadkey(qk) << 32 | self.add_catid(catid))
+        self._changed()
+
+    def add_edges(self, pairs):
+        for qk, catid in pairs:
+            self.add_edge(qk, catid)
+
+    def has_quadkey(self, qk):
+        return qk in self._qk_lut
+
+    def has_catid(self, catid):
+        return catid in self._cat_lut
+
+    def __contains__(self, key):
+        return key in self._qk_lut or key in self._cat_lut
+
+    @property
+    def nquadkeys(self):
+        return len(self.quadkeys)
+
+    @property
+    def ncatids(self):
+        return len(self.catids)
+
+    @property
+    def nedges(self):
+        return len(self._compile()[1])
+
+    def _compile(self):
+        if self._csr is None:
+            edges = np.unique(np.frombuffer(self._edges, dtype=np.int64))
+            self._edges = array('q', edges.tobytes())
+            qcodes = (edges >> 32).astype(np.int32)
+            ccodes = (edges & 0xFFFFFFFF).astype(np.int32)
+            qk_ptr = np.zeros(self.nquadkeys + 1, dtype=np.int32)
+            np.cumsum(np.bincount(qcodes, minlength=self.nquadkeys), out=qk_ptr[1:])
+            order = np.argsort(ccodes, kind='stable')
+            cat_ptr = np.zeros(self.ncatids + 1, dtype=np.int32)
+            np.cumsum(np.bincount(ccodes, minlength=self.ncatids), out=cat_ptr[1:])
+            # unique() sorts by quadkey code first, so ccodes is already the
+            # quadkey-major adjacency
+            self._csr = (qk_ptr, ccodes, cat_ptr, qcodes[order])
+        return self._csr
+
+    def catids_of(self, qk):
+        qk_ptr, qk_adj, _, _ = self._compile()
+        code = self._qk_lut[qk]
+        return [self.catids[i] for i in qk_adj[qk_ptr[code]:qk_ptr[code + 1]]]
+
+    def quadkeys_of(self, catid):
+        _, _, cat_ptr, cat_adj = self._compile()
+        code = self._cat_lut[catid]
+        return [self.quadkeys[i] for i in cat_adj[cat_ptr[code]:cat_ptr[code + 1]]]
+
+    def quadkey_degrees(self):
+        return np.diff(self._compile()[0])
+
+    def catid_degrees(self):
+        return np.diff(self._compile()[2])
+
+    def edges(self):
+        _, qk_adj, _, _ = self._compile()
+        qcodes = np.repeat(np.arange(self.nquadkeys), self.quadkey_degrees())
+        return [(self.quadkeys[q], self.catids[c]) for q, c in zip(qcodes.tolist(), qk_adj.tolist())]
+
+    def graph(self, **attrs):
+        # networkx view in the layout TileCollection.cvg has always had
+        if self._graph is None:
+            g = nx.Graph(**attrs)
+            g.add_nodes_from(self.quadkeys, obj="quadkey")
+            g.add_nodes_from(self.catids, obj="catalog_id")
+            g.add_edges_from((catid, qk) for qk, catid in self.edges())
+            self._graph = g
+        return self._graph
+
+
+
+class CoveragePyramid(object):
+    # Coverage of a set of same-zoom tiles at every coarser zoom, down to
+    # min_zoom. Each level maps the integer quadkey of a cell to the number of
+    # tiles under it, so levels can be read as any-coverage or by covered
+    # fraction, as TileArrays, bitmasks or geometries. add() only touches
+    # the ancestors of the new tiles.
+    #
+    # Geometries are unioned per branch, the cells under one tile at
+    # branch_zoom, in the native UTM crs. A branch is recomputed only after
+    # tiles are added under it, so a level's outline after an add costs one
+    # branch union plus the union of the cached branches.
+
+    def __init__(self, tiler, zoom=None, min_zoom=1, branch_zoom=None):
+        self.tiler = tiler
+        self.zoom = tiler._tiling_zoom_level if zoom is None else zoom
+        self.min_zoom = min_zoom
+        self.branch_zoom = max(min_zoom, self.zoom - 5) if branch_zoom is None else branch_zoom
+        self._leaves = set()
+        self._counts = {z: dict() for z in range(min_zoom, self.zoom + 1)}
+        self._branches = dict()
+        self._levels = dict()
+        self._geoms = dict()
+        self._grids = dict()
+        self.version = 0
+
+    def __len__(self):
+        return len(self._leaves)
+
+    def add(self, quadkeys):
+        # Add tiles (string quadkeys or integer keys) at the pyramid zoom;
+        # returns how many were new
+        keys = np.asarray(quadkeys)
+        if keys.dtype.kind not in 'iu':
+            keys = self.tiler.codec.from_strings(list(quadkeys))
+        keys = np.unique(keys.astype(np.int64))
+        new = np.array([k for k in keys.tolist() if k not in self._leaves], dtype=np.int64)
+        if not len(new):
+            return 0
+        if (key_zoom(new) != self.zoom).any():
+            raise ValueError(f'''Coverage pyramid tiles must be at zoom {self.zoom}''')
+        self._leaves.update(new.tolist())
+        for z, level in self._counts.items():
+            cells, counts = np.unique(key_parent(new, self.zoom - z), return_counts=True)
+            for cell, n in zip(cells.tolist(), counts.tolist()):
+                level[cell] = level.get(cell, 0) + n
+            if z == self.branch_zoom:
+                for cell in cells.tolist():
+                    self._branches.pop(cell, None)
+        self._levels.clear()
+        self._geoms.clear()
+        self._grids.clear()
+        self.version += 1
+        return len(new)
+
+    def _level(self, zoom):
+        if zoom not in self._counts:
+            raise ValueError(f'''Zoom {zoom} is outside the pyramid ({self.min_zoom}-{self.zoom})''')
+        if zoom not in self._levels:
+            level = self._counts[zoom]
+            keys = np.fromiter(level.keys(), dtype=np.int64, count=len(level))
+            counts = np.fromiter(level.values(), dtype=np.int64, count=len(level))
+            order = np.argsort(keys)
+            self._levels[zoom] = (keys[order], counts[order])
+        return self._levels[zoom]
+
+    def fractions(self, zoom):
+        # (keys, covered fraction) of the cells at zoom with any coverage
+        keys, counts = self._level(zoom)
+        return keys, counts / float(4**(self.zoom - zoom))
+
+    def keys(self, zoom=None, min_fraction=0.0):
+        # Cells at zoom with any coverage, or at least min_fraction covered
+        zoom = self.zoom if zoom is None else zoom
+        keys, fractions = self.fractions(zoom)
+        if min_fraction > 0:
+            keys = keys[fractions >= min_fraction]
+        return keys
+
+    def tiles(self, zoom=None, min_fraction=0.0):
+        return TileArray.from_keys(self.keys(zoom, min_fraction), tiler=self.tiler)
+
+    def mask(self, zoom=None, min_fraction=0.0):
+        # (mask, ix0, iy0): a boolean grid over the covered extent at zoom,
+        # mask[iy - iy0, ix - ix0] set for covered cells
+        ix, iy, _ = self.tiler.codec.decode(self.keys(zoom, min_fraction))
+        if not len(ix):
+            return np.zeros((0, 0), dtype=bool), 0, 0
+        ix0, iy0 = int(ix.min()), int(iy.min())
+        mask = np.zeros((int(iy.max()) - iy0 + 1, int(ix.max()) - ix0 + 1), dtype=bool)
+        mask[iy - iy0, ix - ix0] = True
+        return mask, ix0, iy0
+
+    def _branch(self, branch, keys, zoom, min_fraction):
+        cached = self._branches.setdefault(branch, dict())
+        if (zoom, min_fraction) not in cached:
+            cached[(zoom, min_fraction)] = TileArray.from_keys(keys, tiler=self.tiler).footprint(to_crs=None)
+        return cached[(zoom, min_fraction)]
+
+    def _hemisphere_shape(self, keys, zoom, min_fraction):
+        # UTM union of sorted same-hemisphere cells, through the branch cache
+        # when the cells are finer than the branches
+        if zoom <= self.branch_zoom:
+            return TileArray.from_keys(keys, tiler=self.tiler).footprint(to_crs=None)
+        branches = keys >> 2 * (zoom - self.branch_zoom)
+        starts = np.flatnonzero(np.r_[True, branches[1:] != branches[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        parts = [self._branch(int(branches[s]), keys[s:e], zoom, min_fraction)
+                 for s, e in zip(starts.tolist(), ends.tolist())]
+        with metrics.span('geom.unary_union'):
+            return ops.unary_union(parts)
+
+    def geometry(self, zoom=None, to_crs=WORLD_CRS, min_fraction=0.0, simplify=None):
+        # Coverage outline at zoom in to_crs (None keeps UTM, for a single
+        # hemisphere), optionally simplified with tolerance simplify in
+        # to_crs units
+        zoom = self.zoom if zoom is None else zoom
+        cache_key = (zoom, to_crs, min_fraction, simplify)
+        if cache_key in self._geoms:
+            return self._geoms[cache_key]
+        keys = self.keys(zoom, min_fraction)
+        step = self.tiler.tile_length_at_zoom(zoom)
+        parts = []
+        for mask, src_crs in TileArray.from_keys(keys, tiler=self.tiler)._hemispheres():
+            shape = self._hemisphere_shape(keys[mask], zoom, min_fraction)
+            if to_crs is not None and to_crs != src_crs:
+                with metrics.span('geom.transform'):
+                    shape = ops.transform(transformer(src_crs, to_crs), _densify(shape, step))
+            parts.append(shape)
+        if not parts:
+            shape = geom.Polygon()
+        elif len(parts) == 1:
+            shape = parts[0]
+        else:
+            with metrics.span('geom.unary_union'):
+                shape = ops.unary_union(parts)
+        if simplify:
+            shape = shape.simplify(simplify, preserve_topology=True)
+        self._geoms[cache_key] = shape
+        return shape
+
+    def _grid(self, zoom):
+        # (cells, TileGridIndex) of the covered cells at zoom, until the next add
+        if zoom not in self._grids:
+            cells = self.tiles(zoom)
+            self._grids[zoom] = (cells, TileGridIndex(cells))
+        return self._grids[zoom]
+
+    def overlaps(self, bounds, crs, zoom=None):
+        # Cheap pre-filter for an AOI already in one of the tiler's UTM crs:
+        # whether its (xmin, ymin, xmax, ymax) bounds overlap a covered cell
+        # of that hemisphere at a coarse zoom (branch_zoom by default). False
+        # means no tile can intersect the AOI.
+        zoom = min(self.branch_zoom, self.zoom) if zoom is None else zoom
+        cells, grid = self._grid(zoom)
+        hits = grid.query(bounds)
+        if not len(hits):
+            return False
+        north = crs is self.tiler._crs_n or (crs is not self.tiler._crs_s and crs == self.tiler._crs_n)
+        return bool((cells[hits].north == north).any())
+
+    def intersects(self, geometry, crs=WORLD_CRS, zoom=None):
+        # Whether geometry (in crs) touches any covered cell at a coarse zoom
+        zoom = min(self.branch_zoom, self.zoom) if zoom is None else zoom
+        cells, grid = self._grid(zoom)
+        shape = geom.shape(geometry)
+        for mask, utm_crs in cells._hemispheres():
+            aoi = shape if crs == utm_crs else ops.transform(transformer(crs, utm_crs), shape)
+            cand = grid.query(aoi.bounds)
+            cand = cand[mask[cand]]
+            if len(cand):
+                paoi = prep(aoi)
+                if any(paoi.intersects(box) for box in cells[cand].geoms()):
+                    return True
+        return False
+
+
+
 # Accessor api
 
 
+def _is_cog(path):
+    # Skip GDAL sidecars (.aux.xml, .ovr) that land next to the COGs
+    return path.lower().endswith(('.tif', '.tiff'))
+
+
 class CanvasClient(object):
-    def __init__(self, bucket, local=True, s3conn=None):
+    def __init__(self, bucket, local=True, s3conn=None, max_workers=16, progress=None, manifest=None,
+                 pool=None):
         self.bucket = bucket
         self.local = local
         if not local:
             if s3conn is None:
                 s3conn = s3fs.S3FileSystem(anon=False)
         self.s3conn = s3conn
+        self.max_workers = max_workers
+        self.progress = progress
+        self.manifest = manifest
+        # Open COG handles, shared by every zone of a collection
+        self.pool = pool if pool is not None else DatasetPool()
 
     def list_dir(self, *args, **kwargs):
+        with metrics.span('canvas.list_dir'):
+            if self.local:
+                listed = os.listdir(*args, **kwargs)
+            else:
+                listed = self.s3conn.ls(*args, **kwargs)
+        metrics.count('canvas.list_dir.entries', len(listed))
+        return listed
+
+    def _full_path(self, dirpath, listed):
+        # os.listdir gives bare names, s3fs bucket/key paths without a scheme
         if self.local:
-            return os.listdir(*args, **kwargs)
-        return self.s3conn.ls(*args, **kwargs)
+            return os.path.join(dirpath, listed)
+        return listed if "://" in listed else "s3://" + listed
+
+    def _export(self, dest, collections, fmt=None, chunk_size=None):
+        # Stream tiles to dest: a local path, a bucket/key path when not
+        # local, or a binary file object left open for the caller
+        from .export import export_format, export_tiles
+        fmt = export_format(dest, fmt)
+        if hasattr(dest, 'write'):
+            return export_tiles(dest, collections, fmt, chunk_size)
+        with (open(dest, 'wb') if self.local else self.s3conn.open(dest, 'wb')) as f:
+            return export_tiles(f, collections, fmt, chunk_size)
+
+    def list_dirs(self, paths, max_workers=None, progress=None):
+        # Fan out list_dir over many prefixes and yield (path, listing) pairs
+        # in completion order. At most 2 * max_workers listings are in flight,
+        # so paths can be a lazy iterable. progress(done, total) is called
+        # after each listing; total is None when paths has no len.
+        max_workers = max_workers or self.max_workers
+        progress = progress or self.progress
+        total = len(paths) if hasattr(paths, '__len__') else None
+        paths = iter(paths)
+        done = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = dict()
+            for path in itertools.islice(paths, 2 * max_workers):
+                pending[pool.submit(self.list_dir, path)] = path
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    path = pending.pop(fut)
+                    for nxt in itertools.islice(paths, 1):
+                        pending[pool.submit(self.list_dir, nxt)] = nxt
+                    done += 1
+                    if progress is not None:
+                        progress(done, total)
+                    yield path, fut.result()
 
 
 
@@ -223,73 +881,326 @@ class TileCollection(CanvasClient):
         super().__init__(*args, **kwargs)
         self.utm_zone = utm_zone
         self.tiler = ProjectedUTMTiling(zone=utm_zone, tiler=tiler)
-        self.cvg = nx.Graph(store=self.bucket, utm_zone=utm_zone)
+        self.index = CoverageIndex()
+        self._cog_paths = dict()
         self.qk_path = os.path.join(self.bucket, str(utm_zone))
         self._tile_quadkeys_fetched = False
         self._tile_cogs_fetched = False
-        self._qksample = self.tile_quadkeys[0]
+        if self.manifest is not None:
+            self._load_manifest()
+        self._qksample = self._list_quadkeys()[0]
         self._gtm = None
+        self._tiles = None
+        self._grid = None
+        self._pyramid = None
+        self._mixed_zoom = False
+        self._synced = 0
         self.__gi__ = None
 
+    # The index's own lists back the quadkey and catalog id lookups, so the
+    # properties hand out copies and internal code lists through the
+    # underscored methods
+
     @property
     def tile_quadkeys(self):
+        return list(self._list_quadkeys())
+
+    @property
+    def tile_cogs(self):
+        return list(self._list_cogs())
+
+    def _list_quadkeys(self):
         if not self._tile_quadkeys_fetched:
             qk_paths = self.list_dir(self.qk_path)
             for qkp in qk_paths:
-                qk = Path(qkp).parts[-1]
-                self.cvg.add_node(qk, obj="quadkey")
+                self.index.add_quadkey(Path(qkp).parts[-1])
             self._tile_quadkeys_fetched = True
-        return [n for n in self.cvg.nodes() if self.cvg.nodes[n]['obj'] == "quadkey"]
+        return self.index.quadkeys
 
-    @property
-    def tile_cogs(self):
+    def _list_cogs(self):
         if not self._tile_cogs_fetched:
-            for qk in self.tile_quadkeys:
-                cog_path = os.path.join(self.qk_path, qk)
-                cog_files = self.list_dir(cog_path)
-                for fp in cog_files:
+            cog_paths = {os.path.join(self.qk_path, qk): qk for qk in self._list_quadkeys()}
+            for cog_path, cog_files in self.list_dirs(list(cog_paths)):
+                qk = cog_paths[cog_path]
+                for fp in filter(_is_cog, cog_files):
                     catid = Path(fp).stem.split("-")[0]
-                    self.cvg.add_node(catid, obj="catalog_id")
-                    self.cvg.add_edge(catid, qk)
+                    self.index.add_edge(qk, catid)
+                    self._cog_paths.setdefault((qk, catid), []).append(self._full_path(cog_path, fp))
             self._tile_cogs_fetched = True
-        return [n for n in self.cvg.nodes() if self.cvg.nodes[n]['obj'] == 'catalog_id']
+            if self.manifest is not None:
+                self._save_manifest()
+        return self.index.catids
+
+    @property
+    def cvg(self):
+        self._list_cogs()
+        return self.index.graph(store=self.bucket, utm_zone=self.utm_zone)
+
+    def _load_manifest(self):
+        cached = self.manifest.load(self.bucket, self.utm_zone)
+        if cached is None:
+            return False
+        quadkeys, edges = cached
+        for qk in quadkeys:
+            self.index.add_quadkey(qk)
+        self.index.add_edges(edges)
+        self._tile_quadkeys_fetched = True
+        self._tile_cogs_fetched = True
+        return True
+
+    def _save_manifest(self):
+        self.manifest.save(self.bucket, self.utm_zone, self.index.quadkeys, self.index.edges())
+
+    def refresh(self):
+        # Drop the cached coverage and list the bucket again
+        if self.manifest is not None:
+            self.manifest.invalidate(self.bucket, self.utm_zone)
+        self.index = CoverageIndex()
+        self._cog_paths = dict()
+        self._tile_quadkeys_fetched = False
+        self._tile_cogs_fetched = False
+        self._tiles = None
+        self._grid = None
+        self._pyramid = None
+        self._mixed_zoom = False
+        self._synced = 0
+        self.__gi__ = None
+        self._list_cogs()
+
+    def cog_paths(self, quadkey, catid):
+        # COG files for a catalog id under quadkey. Collections loaded from a
+        # manifest list the quadkey directory on first use.
+        paths = self._cog_paths.get((quadkey, catid))
+        if paths is None:
+            qk_dir = os.path.join(self.qk_path, quadkey)
+            for fp in filter(_is_cog, self.list_dir(qk_dir)):
+                key, full = (quadkey, Path(fp).stem.split("-")[0]), self._full_path(qk_dir, fp)
+                if full not in self._cog_paths.setdefault(key, []):
+                    self._cog_paths[key].append(full)
+            paths = self._cog_paths.get((quadkey, catid))
+        if not paths:
+            raise KeyError((quadkey, catid))
+        return sorted(paths)
+
+    def chips(self, zoom, catid=None, quadkeys=None, overview=None, size=None, indexes=None,
+              prefetch=8, max_workers=None):
+        # Yield a Chip(image, bounds, quadkey, catid) for every descendant at
+        # zoom of the collection's tiles (or just quadkeys), for catid or else
+        # every catalog id covering the tile. bounds are the chip's UTM
+        # bounds; size resamples chips to size x size pixels. Up to prefetch
+        # chips are read ahead on a thread pool, in order, and reading pauses
+        # whenever that many are waiting to be consumed.
+        if prefetch < 1:
+            raise ValueError(f'''prefetch must be at least 1, got {prefetch}''')
+        self._list_cogs()
+        if catid is not None:
+            # Only the tiles catid covers have imagery to read
+            covered = set(self.index.quadkeys_of(catid))
+            quadkeys = [qk for qk in (self.tiles.quadkeys if quadkeys is None else quadkeys) if qk in covered]
+        parents = self.tiles if quadkeys is None else TileArray.from_quadkeys(quadkeys, tiler=self.tiler)
+        if not len(parents):
+            return
+        parent_qks = parents.quadkeys
+        children, _ = parents.descendants(zoom)
+        if not len(children):
+            return
+        per_parent = len(children) // len(parents)
+        chip_qks = children.quadkeys
+        bounds = children.utm_bounds
+        out_shape = None if size is None else (size, size)
+
+        def jobs():
+            for p, qk in enumerate(parent_qks):
+                catids = [catid] if catid is not None else sorted(self.index.catids_of(qk))
+                for cat in catids:
+                    for j in range(p * per_parent, (p + 1) * per_parent):
+                        yield chip_qks[j], cat, qk, tuple(bounds[j].tolist())
+
+        def read(job):
+            chip_qk, cat, qk, chip_bounds = job
+            image = self.read(qk, cat, bounds=chip_bounds, overview=overview, indexes=indexes,
+                              out_shape=out_shape)
+            return Chip(image, chip_bounds, chip_qk, cat)
+
+        todo = jobs()
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            ahead = collections.deque(pool.submit(read, job) for job in itertools.islice(todo, prefetch))
+            try:
+                while ahead:
+                    chip = ahead.popleft().result()
+                    for job in itertools.islice(todo, 1):
+                        ahead.append(pool.submit(read, job))
+                    yield chip
+            finally:
+                for fut in ahead:
+                    fut.cancel()
+
+    def read(self, quadkey, catid, window=None, bounds=None, overview=None, indexes=None,
+             out_shape=None, part=0):
+        # Read imagery of catid over quadkey through the collection's
+        # DatasetPool. window is in pixels at the overview level (0 is the
+        # first reduced level, None full resolution); bounds is an
+        # alternative (xmin, ymin, xmax, ymax) in the COG's crs.
+        path = self.cog_paths(quadkey, catid)[part]
+        return self.pool.read(path, window=window, bounds=bounds, overview=overview,
+                              indexes=indexes, out_shape=out_shape)
 
     @property
     def nqks(self):
-        return len(self.tile_quadkeys)
+        self._list_quadkeys()
+        return self.index.nquadkeys
 
     @property
     def ncatids(self):
-        return len(self.tile_cogs)
+        self._list_cogs()
+        return self.index.ncatids
+
+    def stats(self):
+        # Every ZONE_STATS metric from one listing and one compile of the
+        # coverage index
+        self._list_cogs()
+        index = self.index
+        depth = index.quadkey_degrees()
+        zooms = np.fromiter(map(len, index.quadkeys), dtype=np.int64, count=index.nquadkeys)
+        lengths = self.tiler.tile_length_at_zoom(zooms)
+        return np.array([(self.utm_zone, index.nquadkeys, index.ncatids, index.nedges,
+                          np.count_nonzero(depth), float(np.sum(lengths * lengths)),
+                          float(depth.mean()) if len(depth) else 0.0,
+                          int(depth.max()) if len(depth) else 0)], dtype=ZONE_STATS)[0]
 
     @property
     def area_coverage(self, units='m'):
         return str((5_000 * 5_000) * self.nqks) + ' ' + units + '^2'
 
     def __getitem__(self, quadkey):
-        if quadkey not in self.tile_quadkeys:
-            raise KeyError
+        if quadkey not in self:
+            raise KeyError(quadkey)
         return self.tiler.tile_from_quadkey(quadkey)
 
+    def __contains__(self, quadkey):
+        self._list_quadkeys()
+        return self.index.has_quadkey(quadkey)
+
+    def __len__(self):
+        return self.nqks
+
     def __setitem__(self, item):
         raise NotImplementedError
 
+    def _sync(self):
+        # The tile array, grid index, outline and pyramid are all derived from
+        # the index's quadkeys; when it has gained some since they were built
+        # the first three are dropped and the pyramid is extended, so they
+        # always agree
+        quadkeys = self._list_quadkeys()
+        if self._synced == len(quadkeys):
+            return
+        if self._pyramid is not None:
+            new = quadkeys[self._synced:]
+            if all(len(qk) == self._pyramid.zoom for qk in new):
+                self._pyramid.add(new)
+            else:
+                self._pyramid = None
+                self._mixed_zoom = True
+        self._synced = len(quadkeys)
+        self._tiles = None
+        self._grid = None
+        self.__gi__ = None
+
+    @property
+    def tiles(self):
+        self._sync()
+        if self._tiles is None:
+            with metrics.span('canvas.tiles'):
+                self._tiles = TileArray.from_quadkeys(self._list_quadkeys(),
+                                                      tiler=self.tiler).sorted()
+            metrics.count('canvas.tiles', len(self._tiles))
+        return self._tiles
+
     def __iter__(self):
-        tiles = np.array([self.tiler._tiler.quadkey_to_tile(qk)
-                          for qk in self.tile_quadkeys], dtype=GeoTile.dtype)
-        for tile in np.sort(tiles, order=['iy', 'ix']):
-            yield self.tiler._tf(tt.base.Tile(*tile))
+        return iter(self.tiles)
+
+    @property
+    def grid_index(self):
+        tiles = self.tiles
+        if self._grid is None:
+            self._grid = TileGridIndex(tiles)
+        return self._grid
+
+    def tiles_intersecting(self, geometry, crs=WORLD_CRS, quadkeys=False):
+        # Tiles whose footprint intersects geometry (any geo-interface object
+        # in crs). The AOI is reprojected once per hemisphere, candidates come
+        # from the grid index and only those get an exact intersects test.
+        shape = geom.shape(geometry)
+        tiles = self.tiles
+        pyramid = self.pyramid
+        hits = []
+        for mask, utm_crs in tiles._hemispheres():
+            if crs == utm_crs:
+                aoi = shape
+            else:
+                with metrics.span('geom.transform'):
+                    aoi = ops.transform(transformer(crs, utm_crs), shape)
+            # A coarse pyramid level rules out AOIs away from the coverage
+            if pyramid is not None and not pyramid.overlaps(aoi.bounds, utm_crs):
+                continue
+            cand = self.grid_index.query(aoi.bounds)
+            cand = cand[mask[cand]]
+            if not len(cand):
+                continue
+            paoi = prep(aoi)
+            hit = np.fromiter((paoi.intersects(box) for box in tiles[cand].geoms()),
+                              dtype=bool, count=len(cand))
+            hits.append(cand[hit])
+        found = tiles[np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.intp)]
+        if quadkeys:
+            return found.quadkeys
+        return found
+
+    def export(self, dest, fmt=None, chunk_size=None):
+        # Write every tile as a GeoJSON FeatureCollection ('geojson'), one
+        # feature per line ('ndjson') or GeoParquet ('parquet', needs pyarrow),
+        # chunk_size tiles at a time. fmt defaults from the dest extension.
+        # Returns the number of tiles written.
+        return self._export(dest, [self], fmt=fmt, chunk_size=chunk_size)
 
     def iter_geoms(self):
-        for tile in iter(self):
-            with WGS84Transformer(tile) as geotile:
-                yield geotile.asShape
+        for shape in self.tiles.geoms(WORLD_CRS):
+            yield shape
+
+    @property
+    def pyramid(self):
+        # CoveragePyramid of the zone, kept up to date with the index; None
+        # when the zone holds tiles of more than one zoom
+        self._sync()
+        if self._pyramid is None and not self._mixed_zoom:
+            quadkeys = self.index.quadkeys
+            zoom = len(quadkeys[0])
+            if all(len(qk) == zoom for qk in quadkeys):
+                self._pyramid = CoveragePyramid(self.tiler, zoom=zoom)
+                self._pyramid.add(quadkeys)
+            else:
+                self._mixed_zoom = True
+        return self._pyramid
+
+    def overview(self, zoom, to_crs=WORLD_CRS, min_fraction=0.0, simplify=None):
+        # Coverage outline at a coarser zoom, for maps and AOI checks; see
+        # CoveragePyramid.geometry
+        pyramid = self.pyramid
+        if pyramid is None:
+            raise ValueError(f'''Zone {self.utm_zone} mixes tile zooms; overviews need a single zoom''')
+        return pyramid.geometry(zoom, to_crs=to_crs, min_fraction=min_fraction, simplify=simplify)
 
     @property
     def __geo_interface__(self):
+        # Through the pyramid's branch cache when the zone is single zoom
+        pyramid = self.pyramid
         if self.__gi__ is None:
-            self.__gi__ = itrreduce(ops.unary_union,
-                                    self.iter_geoms()).__geo_interface__
+            if pyramid is not None:
+                shape = pyramid.geometry(to_crs=WORLD_CRS)
+            else:
+                shape = self.tiles.footprint(WORLD_CRS)
+            self.__gi__ = shape.__geo_interface__
         return self.__gi__
 
     @property
@@ -309,6 +1220,7 @@ class CanvasCollection(CanvasClient):
         self.tiler = tilescheme()
         self._zlut = dict()
         self._zone_paths_fetched = False
+        self._stats = None
 
     def canvas_zones(self):
         if not self._zone_paths_fetched:
@@ -321,14 +1233,82 @@ class CanvasCollection(CanvasClient):
         if zone not in self.canvas_zones():
             raise OSError("Zone {} not in path".format(zone))
         if zone in self._zlut: return self._zlut[zone]
-        self._zlut[zone] = TileCollection(zone, bucket=self.bucket, local=self.local, s3conn=self.s3conn, tiler=self.tiler, **kwargs)
+        self._zlut[zone] = self._new_zone(zone, **kwargs)
         return self._zlut[zone]
 
+    def _new_zone(self, zone, **kwargs):
+        kwargs.setdefault('max_workers', self.max_workers)
+        kwargs.setdefault('progress', self.progress)
+        kwargs.setdefault('manifest', self.manifest)
+        kwargs.setdefault('pool', self.pool)
+        return TileCollection(zone, bucket=self.bucket, local=self.local, s3conn=self.s3conn, tiler=self.tiler, **kwargs)
+
+    def aoi_zones(self, geometry=None):
+        # Canvas zones whose 6 degree UTM band overlaps the AOI. Tiles on a
+        # band edge reach past it by up to a tile width, so the band is
+        # padded by that much, in longitude at the AOI's highest latitude.
+        shape = geom.shape(self.aoi if geometry is None else geometry)
+        lonmin, latmin, lonmax, latmax = shape.bounds
+        lat = min(max(abs(latmin), abs(latmax)), 84.0)
+        pad = self.tiler.tile_size / (111320.0 * math.cos(math.radians(lat)))
+        first = int(math.floor((lonmin - pad + 180) / 6))
+        last = int(math.floor((lonmax + pad + 180) / 6))
+        bands = set(i % 60 + 1 for i in range(first, min(last, first + 59) + 1))
+        return [z for z in self.canvas_zones() if z in bands]
+
+    def tiles_intersecting(self, geometry=None, quadkeys=False):
+        # Per-zone tiles intersecting a WGS84 geometry, the collection aoi by
+        # default. Zones outside the AOI's UTM bands are never listed.
+        if geometry is None:
+            geometry = self.aoi
+        if geometry is None:
+            raise ValueError("No geometry given and no aoi set on the collection")
+        hits = dict()
+        for z in self.aoi_zones(geometry):
+            found = self.zone(z).tiles_intersecting(geometry, quadkeys=quadkeys)
+            if len(found):
+                hits[z] = found
+        return hits
+
+    def export(self, dest, fmt=None, zones=None, chunk_size=None):
+        # TileCollection.export over zones (all canvas zones by default) into
+        # one output. Zones not already loaded are built one at a time and
+        # dropped once written rather than kept on the collection.
+        zones = self.canvas_zones() if zones is None else zones
+        def collections():
+            for z in zones:
+                if z not in self.canvas_zones():
+                    raise OSError("Zone {} not in path".format(z))
+                yield self._zlut[z] if z in self._zlut else self._new_zone(z)
+        return self._export(dest, collections(), fmt=fmt, chunk_size=chunk_size)
+
+    def stats(self, zones=None, max_workers=None, refresh=False):
+        # ZONE_STATS array with a row per zone (all canvas zones by default),
+        # sorted by zone. Zones are built and listed concurrently, max_workers
+        # at a time. The rows are cached; refresh=True lists the zones again,
+        # bypassing the manifest for zones not loaded yet.
+        zones = sorted(self.canvas_zones() if zones is None else zones)
+        cached = dict() if self._stats is None or refresh else {int(r['zone']): r for r in self._stats}
+        todo = [z for z in zones if z not in cached]
+        def build(z):
+            if refresh and z in self._zlut:
+                self._zlut[z].refresh()
+            elif refresh and self.manifest is not None:
+                self.manifest.invalidate(self.bucket, z)
+            return self.zone(z).stats()
+        if todo:
+            workers = min(max_workers or self.max_workers, len(todo))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for row in pool.map(build, todo):
+                    cached[int(row['zone'])] = row
+        self._stats = np.array(sorted(cached.values(), key=lambda r: r['zone']), dtype=ZONE_STATS)
+        return self._stats[np.isin(self._stats['zone'], zones)]
+
     def descriptions(self):
-        for z in self.canvas_zones():
-            print(z)
-            print("Total data area covered: " + self.zone(z).area_coverage)
-            print("Total number of quadkey zones: " + str(self.zone(z).nqks))
-            print("Total number of catalog ids tiled: " + str(self.zone(z).ncatids))
+        for row in self.stats():
+            print(row['zone'])
+            print("Total data area covered: " + str(int(row['area'])) + ' m^2')
+            print("Total number of quadkey zones: " + str(row['quadkeys']))
+            print("Total number of catalog ids tiled: " + str(row['catids']))
             print("\n")
 
@@ -0,0 +1,122 @@
+import os
+import json
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # columnar export needs pyarrow
+    pa = None
+try:
+    from shapely import to_wkb as _to_wkb
+except ImportError: # shapely < 2
+    _to_wkb = None
+
+from .canvas import WORLD_CRS
+
+
+FORMATS = {
+    '.geojson': 'geojson',
+    '.json': 'geojson',
+    '.ndjson': 'ndjson',
+    '.geojsonl': 'ndjson',
+    '.geojsons': 'ndjson',
+    '.parquet': 'parquet',
+}
+
+
+def export_format(dest, fmt=None):
+    if fmt is None:
+        name = dest if isinstance(dest, str) else getattr(dest, 'name', '')
+        fmt = FORMATS.get(os.path.splitext(str(name))[1].lower())
+        if fmt is None:
+            raise ValueError(f'''Cannot tell the export format of {name!r}; pass fmt''')
+    if fmt not in set(FORMATS.values()):
+        raise ValueError(f'''Unknown export format {fmt}''')
+    if fmt == 'parquet' and pa is None:
+        raise ImportError("Parquet export needs pyarrow")
+    return fmt
+
+
+def _chunks(collections, chunk_size):
+    # (zone, TileArray) slices of at most chunk_size tiles. Tiles that don't
+    # reproject to finite coordinates are left out, since neither JSON nor
+    # WKB readers make sense of inf or nan
+    for collection in collections:
+        tiles = collection.tiles
+        for start in range(0, len(tiles), chunk_size):
+            chunk = tiles[start:start + chunk_size]
+            finite = np.isfinite(chunk.rings(WORLD_CRS)).all(axis=(1, 2))
+            if not finite.all():
+                chunk = chunk[finite]
+            if len(chunk):
+                yield collection.utm_zone, chunk
+
+
+def _ring_json(ring):
+    return "[[" + ",".join(f'''[{x!r},{y!r}]''' for x, y in ring) + "]]"
+
+
+def _feature_json(zone, chunk):
+    # Features with the to_gjson properties, formatted straight to text
+    rings = chunk.rings(WORLD_CRS).tolist()
+    for qk, ix, iy, zoom, ring in zip(chunk.quadkeys, chunk.ix.tolist(), chunk.iy.tolist(),
+                                      chunk.zoom.tolist(), rings):
+        yield ('{"type":"Feature","properties":{"tile_id":"%s+%s","ix":%d,"iy":%d,"zoom":%d},'
+               '"geometry":{"type":"Polygon","coordinates":%s}}' % (zone, qk, ix, iy, zoom, _ring_json(ring)))
+
+
+def write_geojson(f, collections, chunk_size=4096, seq=False):
+    # A FeatureCollection, or one feature per line when seq is True, written
+    # chunk by chunk to a binary file object
+    n = 0
+    if not seq:
+        f.write(b'{"type":"FeatureCollection","features":[\n')
+    for zone, chunk in _chunks(collections, chunk_size):
+        lines = list(_feature_json(zone, chunk))
+        if seq:
+            f.write(("\n".join(lines) + "\n").encode('utf-8'))
+        else:
+            f.write(((",\n" if n else "") + ",\n".join(lines)).encode('utf-8'))
+        n += len(lines)
+    if not seq:
+        f.write(b'\n]}\n')
+    return n
+
+
+def _geo_metadata():
+    # GeoParquet metadata; coordinates are lon/lat so the default crs applies
+    return json.dumps({"version": "1.0.0",
+                       "primary_column": "geometry",
+                       "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Polygon"]}}})
+
+
+def write_parquet(f, collections, chunk_size=65536):
+    # GeoParquet with one row group per chunk
+    schema = pa.schema([("tile_id", pa.string()), ("utm_zone", pa.int32()), ("quadkey", pa.string()),
+                        ("ix", pa.int64()), ("iy", pa.int64()), ("zoom", pa.int8()),
+                        ("geometry", pa.binary())],
+                       metadata={b"geo": _geo_metadata().encode('utf-8')})
+    n = 0
+    with pq.ParquetWriter(f, schema, compression="zstd") as writer:
+        for zone, chunk in _chunks(collections, chunk_size):
+            quadkeys = chunk.quadkeys
+            shapes = chunk.geoms(WORLD_CRS)
+            wkb = list(_to_wkb(shapes)) if _to_wkb is not None else [s.wkb for s in shapes]
+            table = pa.table({"tile_id": [f'''{zone}+{qk}''' for qk in quadkeys],
+                              "utm_zone": [zone] * len(chunk),
+                              "quadkey": quadkeys,
+                              "ix": chunk.ix, "iy": chunk.iy, "zoom": chunk.zoom.astype('int8'),
+                              "geometry": wkb}, schema=schema)
+            writer.write_table(table)
+            n += len(chunk)
+    return n
+
+
+def export_tiles(f, collections, fmt, chunk_size=None):
+    # Write the tiles of every collection to the binary file object f;
+    # returns the number of tiles written
+    if fmt == 'parquet':
+        return write_parquet(f, collections, chunk_size=chunk_size or 65536)
+    return write_geojson(f, collections, chunk_size=chunk_size or 4096, seq=(fmt == 'ndjson'))
@@ -0,0 +1,138 @@
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import rasterio
+import rasterio.features
+import rasterio.transform
+
+from .canvas import WORLD_CRS
+from .assign import TileAssigner, _feature_parts
+
+
+def _matcher(spec):
+    # A class is a tag key, a (key, value or values) pair or a callable on tags
+    if callable(spec):
+        return spec
+    if isinstance(spec, str):
+        return lambda tags: spec in tags
+    key, vals = spec
+    vals = {vals} if isinstance(vals, str) else set(vals)
+    return lambda tags: tags.get(key) in vals
+
+
+def _burn_chunk(job):
+    # Worker: rasterize every tile of one chunk and write it out
+    names, shapes, classes, tiles, crs, out_dir, fmt, resolution, all_touched = job
+    written = []
+    for quadkey, bounds, members in tiles:
+        xmin, ymin, xmax, ymax = bounds
+        width = max(1, int(round((xmax - xmin) / resolution)))
+        height = max(1, int(round((ymax - ymin) / resolution)))
+        transform = rasterio.transform.from_bounds(xmin, ymin, xmax, ymax, width, height)
+        masks = np.zeros((len(names), height, width), dtype=np.uint8)
+        for c in range(len(names)):
+            burn = [shapes[i] for i in members if classes[i] == c]
+            if burn:
+                rasterio.features.rasterize(burn, out=masks[c], transform=transform,
+                                            default_value=1, all_touched=all_touched)
+        path = os.path.join(out_dir, f'''{quadkey}.{fmt}''')
+        if fmt == "npz":
+            np.savez_compressed(path, masks=masks, bounds=np.asarray(bounds),
+                                classes=np.asarray(names), crs=crs)
+        else:
+            profile = dict(driver="GTiff", width=width, height=height, count=len(names),
+                           dtype="uint8", crs=crs, transform=transform,
+                           compress="deflate", nbits=1)
+            if width % 16 == 0 and height % 16 == 0 and min(width, height) >= 256:
+                profile.update(tiled=True, blockxsize=256, blockysize=256)
+            with rasterio.open(path, "w", **profile) as dst:
+                dst.write(masks)
+                for c, name in enumerate(names):
+                    dst.set_band_description(c + 1, name)
+        written.append((quadkey, path))
+    return written
+
+
+class LabelRasterizer(object):
+    # Burns per-class label masks for the tiles of a TileCollection, aligned
+    # to each tile's UTM bounds at resolution meters per pixel. classes maps
+    # class names to a tag key, a (key, values) pair or a predicate on tags;
+    # each becomes one band of the tile's mask.
+    #
+    # Features (query Elements or GeoJSON features in WGS84) are classified
+    # and reprojected once per hemisphere crs the zone uses, and matched to
+    # tiles with one bulk TileAssigner query. Tiles are then rasterized in
+    # chunks of chunk_size neighbouring tiles across a process pool, each
+    # written as <out_dir>/<quadkey>.tif (deflate GeoTIFF) or .npz.
+
+    def __init__(self, collection, classes, resolution=1.0, fmt="tif", max_workers=None,
+                 chunk_size=64, all_touched=False, skip_empty=False):
+        if fmt not in ("tif", "npz"):
+            raise ValueError(f'''Unknown label format {fmt}''')
+        self.collection = collection
+        self.names = list(classes)
+        self._matchers = [_matcher(classes[name]) for name in self.names]
+        self.resolution = resolution
+        self.fmt = fmt
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.all_touched = all_touched
+        self.skip_empty = skip_empty
+        self.assigner = TileAssigner(collection)
+
+    def classify(self, features):
+        # Parallel lists of (geometry, class index); a feature matching
+        # several classes is burned into each of them
+        shapes, classes = [], []
+        for feature in features:
+            tags, shape = _feature_parts(feature)
+            if shape is None or shape.is_empty:
+                continue
+            for c, match in enumerate(self._matchers):
+                if match(tags):
+                    shapes.append(shape)
+                    classes.append(c)
+        return shapes, np.asarray(classes, dtype=np.int32)
+
+    def _jobs(self, shapes, classes, crs, out_dir):
+        tiles = self.collection.tiles
+        bounds = tiles.utm_bounds
+        quadkeys = tiles.quadkeys
+        for (mask, _), (utm_crs, projected, fi, ti) in zip(tiles._hemispheres(),
+                                                         self.assigner.pairs(shapes, crs)):
+            members = [[] for _ in range(len(tiles))]
+            for i, t in zip(fi.tolist(), ti.tolist()):
+                members[t].append(i)
+            hemi = [t for t in np.flatnonzero(mask).tolist() if members[t] or not self.skip_empty]
+            for start in range(0, len(hemi), self.chunk_size):
+                chunk = hemi[start:start + self.chunk_size]
+                # Ship only the geometries this chunk needs, renumbered
+                used = sorted(set(itertools.chain.from_iterable(members[t] for t in chunk)))
+                local = {i: k for k, i in enumerate(used)}
+                chunk_tiles = [(quadkeys[t], tuple(bounds[t].tolist()), [local[i] for i in members[t]])
+                               for t in chunk]
+                yield (self.names, list(projected[used]), classes[used].tolist(),
+                       chunk_tiles, utm_crs.to_wkt(), out_dir, self.fmt, self.resolution,
+                       self.all_touched)
+
+    def run(self, features, out_dir, crs=WORLD_CRS, progress=None):
+        # Yield (quadkey, path) as tiles are written. At most 2 * max_workers
+        # chunks are in flight; progress(done, None) is called per chunk.
+        os.makedirs(out_dir, exist_ok=True)
+        shapes, classes = self.classify(features)
+        jobs = self._jobs(shapes, classes, crs, out_dir)
+        done = 0
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = set(pool.submit(_burn_chunk, job)
+                          for job in itertools.islice(jobs, 2 * self.max_workers))
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    for job in itertools.islice(jobs, 1):
+                        pending.add(pool.submit(_burn_chunk, job))
+                    done += 1
+                    if progress is not None:
+                        progress(done, None)
+                    yield from fut.result()
@@ -0,0 +1,95 @@
+import os
+import time
+import zlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.expanduser("~"), ".cache", "skyway", "manifest.sqlite")
+
+
+def _pack(rows):
+    return zlib.compress("\n".join(rows).encode("utf-8"))
+
+
+def _unpack(blob):
+    s = zlib.decompress(blob).decode("utf-8")
+    return s.split("\n") if s else []
+
+
+class CoverageManifest(object):
+    # Local cache of the quadkey <-> catalog id coverage of a canvas bucket, one
+    # row per (bucket, utm zone). Both sides are stored as zlib-compressed
+    # newline-joined blobs so a zone loads with a single row read. Entries older
+    # than ttl seconds are treated as missing; ttl=None keeps them until they
+    # are invalidated.
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # An in-memory database lives in its one connection, so that is shared
+        # between threads and used under a lock; files get a connection per
+        # session
+        self._memconn = sqlite3.connect(path, check_same_thread=False) if path == ":memory:" else None
+        self._memlock = threading.Lock()
+        with self._session() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS coverage (
+                                bucket TEXT NOT NULL,
+                                zone INTEGER NOT NULL,
+                                fetched REAL NOT NULL,
+                                quadkeys BLOB NOT NULL,
+                                edges BLOB NOT NULL,
+                                PRIMARY KEY (bucket, zone))""")
+
+    @contextmanager
+    def _session(self):
+        if self._memconn is not None:
+            with self._memlock, self._memconn:
+                yield self._memconn
+            return
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(bucket):
+        return str(bucket).rstrip("/")
+
+    def load(self, bucket, zone):
+        # Returns (quadkeys, [(quadkey, catid), ...]) or None on a miss
+        with self._session() as conn:
+            row = conn.execute("SELECT fetched, quadkeys, edges FROM coverage "
+                               "WHERE bucket = ? AND zone = ?",
+                               (self._key(bucket), int(zone))).fetchone()
+        if row is None:
+            return None
+        fetched, quadkeys, edges = row
+        if self.ttl is not None and time.time() - fetched > self.ttl:
+            return None
+        edges = [tuple(e.split("\t")) for e in _unpack(edges)]
+        return _unpack(quadkeys), edges
+
+    def save(self, bucket, zone, quadkeys, edges):
+        row = (self._key(bucket), int(zone), time.time(),
+               _pack(quadkeys), _pack("\t".join(e) for e in edges))
+        with self._session() as conn:
+            conn.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?)", row)
+
+    def invalidate(self, bucket=None, zone=None):
+        # Drop one zone, a whole bucket, or everything
+        clauses, params = [], []
+        if bucket is not None:
+            clauses.append("bucket = ?")
+            params.append(self._key(bucket))
+        if zone is not None:
+            clauses.append("zone = ?")
+            params.append(int(zone))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self._session() as conn:
+            conn.execute("DELETE FROM coverage" + where, params)
@@ -0,0 +1,206 @@
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+# Instrumentation of the hot paths: timing spans and counters, reported to
+# whichever sinks are installed. With no sink installed span() hands back a
+# shared no-op context manager and count() returns after one truth test, so
+# the calls can stay in place in production.
+
+_sinks = []
+
+
+def enabled():
+    return bool(_sinks)
+
+
+# The sink list is replaced rather than mutated, so threads reporting while
+# sinks come and go never see it change under them
+
+def add_sink(sink):
+    global _sinks
+    if sink not in _sinks:
+        _sinks = _sinks + [sink]
+    return sink
+
+
+def remove_sink(sink):
+    global _sinks
+    _sinks = [s for s in _sinks if s is not sink]
+
+
+def clear_sinks():
+    global _sinks
+    _sinks = []
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    # with span('canvas.list_dir'): ... reports the block's wall time
+    if not _sinks:
+        return _null_span
+    return _Span(name)
+
+
+def timed_iter(name, iterable):
+    # Wrap iterable so the time spent producing items, not the consumer's
+    # time between them, is reported as one name span when it is exhausted
+    # or closed, along with a name count of the items
+    if not _sinks:
+        return iter(iterable)
+    return _timed_iter(name, iter(iterable))
+
+
+def _timed_iter(name, it):
+    n, spent = 0, 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - start
+            n += 1
+            yield item
+    finally:
+        close = getattr(it, 'close', None)
+        if close is not None:
+            close()
+        observe(name, spent)
+        count(name, n)
+
+
+def observe(name, seconds):
+    for sink in _sinks:
+        sink.observe(name, seconds)
+
+
+def count(name, value=1):
+    if not _sinks:
+        return
+    for sink in _sinks:
+        sink.count(name, value)
+
+
+class LogSink(object):
+    # Every span and counter increment as a log record
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger('skyway.metrics')
+        self.level = level
+
+    def observe(self, name, seconds):
+        self.logger.log(self.level, '%s %.6fs', name, seconds)
+
+    def count(self, name, value):
+        self.logger.log(self.level, '%s +%s', name, value)
+
+
+class MemorySink(object):
+    # Aggregates in memory: counters are summed, spans keep count, total
+    # and max seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict()
+        self.timers = dict()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            t = self.timers.get(name)
+            if t is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                t[0] += 1
+                t[1] += seconds
+                if seconds > t[2]:
+                    t[2] = seconds
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {"counters": dict(self.counters),
+                    "timers": {name: {"count": n, "total": total, "max": peak}
+                               for name, (n, total, peak) in self.timers.items()}}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+
+_metric_regex = re.compile(r'[^a-zA-Z0-9_]')
+
+
+class PrometheusSink(MemorySink):
+    # MemorySink exposed in the Prometheus text format: counters as
+    # <prefix>_<name>_total, spans as <prefix>_<name>_seconds summaries plus
+    # a _max gauge
+
+    def __init__(self, prefix='skyway'):
+        super().__init__()
+        self.prefix = prefix
+
+    def _name(self, name):
+        return _metric_regex.sub('_', f'''{self.prefix}_{name}''' if self.prefix else name)
+
+    def text(self):
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            metric = self._name(name) + '_total'
+            lines.append(f'''# TYPE {metric} counter''')
+            lines.append(f'''{metric} {value}''')
+        for name, t in sorted(snap["timers"].items()):
+            metric = self._name(name) + '_seconds'
+            lines.append(f'''# TYPE {metric} summary''')
+            lines.append(f'''{metric}_count {t["count"]}''')
+            lines.append(f'''{metric}_sum {t["total"]:.6f}''')
+            lines.append(f'''# TYPE {metric}_max gauge''')
+            lines.append(f'''{metric}_max {t["max"]:.6f}''')
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def collect(sink=None):
+    # Install sink (a new MemorySink by default) for the block
+    sink = add_sink(sink if sink is not None else MemorySink())
+    try:
+        yield sink
+    finally:
+        remove_sink(sink)
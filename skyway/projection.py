@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+from pyproj import CRS, Transformer
+
+
+class TransformerRegistry(object):
+    # pyproj Transformers keyed on (source, destination) crs. Transformers
+    # must not be shared between threads, so every thread gets its own LRU
+    # of at most maxsize of them. CRS objects hash through to_wkt, which is
+    # slower than building the key is worth, so lookups go through the
+    # identity of the crs objects first and only fall back to their wkt.
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._local = threading.local()
+
+    def _caches(self):
+        local = self._local
+        if not hasattr(local, 'transformers'):
+            local.transformers = OrderedDict()
+            local.keys = dict()
+            local.hits = local.misses = 0
+        return local
+
+    def _key(self, local, src, dst):
+        hit = local.keys.get((id(src), id(dst)))
+        if hit is not None and hit[0] is src and hit[1] is dst:
+            return hit[2]
+        key = (CRS.from_user_input(src).to_wkt(), CRS.from_user_input(dst).to_wkt())
+        if len(local.keys) >= 8 * self.maxsize:
+            local.keys.clear()
+        # The crs objects are held so their ids cannot be reused
+        local.keys[(id(src), id(dst))] = (src, dst, key)
+        return key
+
+    def get(self, src, dst):
+        local = self._caches()
+        key = self._key(local, src, dst)
+        transformers = local.transformers
+        tr = transformers.get(key)
+        if tr is None:
+            local.misses += 1
+            tr = Transformer.from_crs(src, dst, always_xy=True)
+            transformers[key] = tr
+            while len(transformers) > self.maxsize:
+                transformers.popitem(last=False)
+        else:
+            local.hits += 1
+            transformers.move_to_end(key)
+        return tr
+
+    def transform(self, src, dst):
+        # The (x, y) -> (x, y) callable, as taken by shapely.ops.transform
+        return self.get(src, dst).transform
+
+    def clear(self):
+        local = self._caches()
+        local.transformers.clear()
+        local.keys.clear()
+
+    @property
+    def stats(self):
+        # Counters of the calling thread
+        local = self._caches()
+        return {"hits": local.hits, "misses": local.misses, "size": len(local.transformers)}
+
+
+registry = TransformerRegistry()
+
+
+def get_transformer(src, dst):
+    return registry.get(src, dst)
+
+
+def transformer(src, dst):
+    return registry.transform(src, dst)
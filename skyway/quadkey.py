@@ -0,0 +1,144 @@
+import numpy as np
+import tiletanic as tt
+
+
+# Integer quadkeys: the quadkey digits as base 4 behind a sentinel 1 bit,
+# (1 << 2 * zoom) | digits, so the zoom is recoverable and keys of every zoom
+# level are distinct. The parent of a key is key >> 2 and its children are
+# key << 2 | 0..3; prefixes sort before their descendants. 31 zoom levels fit
+# in an int64.
+
+MAX_ZOOM = 31
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_M8 = np.uint64(0x00FF00FF00FF00FF)
+_M16 = np.uint64(0x0000FFFF0000FFFF)
+_M32 = np.uint64(0x00000000FFFFFFFF)
+
+
+def _spread(v):
+    # Bit i of v to bit 2i
+    v = np.asarray(v).astype(np.uint64) & _M32
+    v = (v | (v << np.uint64(16))) & _M16
+    v = (v | (v << np.uint64(8))) & _M8
+    v = (v | (v << np.uint64(4))) & _M4
+    v = (v | (v << np.uint64(2))) & _M2
+    return (v | (v << np.uint64(1))) & _M1
+
+
+def _compact(v):
+    # Bit 2i of v to bit i
+    v = v & _M1
+    v = (v | (v >> np.uint64(1))) & _M2
+    v = (v | (v >> np.uint64(2))) & _M4
+    v = (v | (v >> np.uint64(4))) & _M8
+    v = (v | (v >> np.uint64(8))) & _M16
+    return ((v | (v >> np.uint64(16))) & _M32).astype(np.int64)
+
+
+def key_zoom(keys):
+    # Zoom level of each key: half the position of its sentinel bit
+    keys = np.asarray(keys, dtype=np.int64)
+    zoom = np.zeros(keys.shape, dtype=np.int64)
+    for step in (16, 8, 4, 2, 1):
+        up = (keys >> (2 * (zoom + step))) > 0
+        zoom += step * up
+    return zoom
+
+
+def key_parent(keys, levels=1):
+    return np.asarray(keys, dtype=np.int64) >> (2 * levels)
+
+
+def key_children(keys):
+    # (N, 4) children of each key, in digit order
+    return (np.asarray(keys, dtype=np.int64)[:, None] << 2) | np.arange(4, dtype=np.int64)
+
+
+class QuadkeyCodec(object):
+    # Vectorized (ix, iy, zoom) <-> integer quadkey <-> string quadkey for one
+    # tiletanic tile scheme. Schemes differ in which digit bit each axis
+    # drives and whether the y bit is inverted (top-left origins); that
+    # mapping is read off the scheme's own quadkeys at zoom 1.
+
+    def __init__(self, scheme):
+        digit = lambda x, y: int(scheme.quadkey(tt.base.Tile(x, y, 1)))
+        self.base = digit(0, 0)
+        self.xbit = digit(1, 0) ^ self.base
+        self.ybit = digit(0, 1) ^ self.base
+        if sorted((self.xbit, self.ybit)) != [1, 2]:
+            raise ValueError(f'''Unsupported quadkey layout for {type(scheme).__name__}''')
+
+    def _flips(self, zoom):
+        # The base digit repeated at every level of zoom
+        return (_M1.astype(np.int64) & ((np.int64(1) << (2 * zoom)) - 1)) * self.base
+
+    def encode(self, ix, iy, zoom):
+        ix, iy = np.asarray(ix, dtype=np.int64), np.asarray(iy, dtype=np.int64)
+        zoom = np.broadcast_to(np.asarray(zoom, dtype=np.int64), ix.shape)
+        if zoom.size and zoom.max() > MAX_ZOOM:
+            raise ValueError(f'''Integer quadkeys hold at most {MAX_ZOOM} zoom levels''')
+        xs, ys = _spread(ix).astype(np.int64), _spread(iy).astype(np.int64)
+        digits = (xs << (self.xbit - 1)) | (ys << (self.ybit - 1))
+        return (np.int64(1) << (2 * zoom)) | (digits ^ self._flips(zoom))
+
+    def decode(self, keys):
+        # (ix, iy, zoom) int64 arrays
+        keys = np.asarray(keys, dtype=np.int64)
+        zoom = key_zoom(keys)
+        digits = (keys ^ self._flips(zoom)) & ((np.int64(1) << (2 * zoom)) - 1)
+        digits = digits.astype(np.uint64)
+        ix = _compact(digits >> np.uint64(self.xbit - 1))
+        iy = _compact(digits >> np.uint64(self.ybit - 1))
+        return ix, iy, zoom
+
+    def from_strings(self, quadkeys):
+        # Keys of string quadkeys, one array operation per distinct length
+        quadkeys = list(quadkeys)
+        keys = np.empty(len(quadkeys), dtype=np.int64)
+        if not quadkeys:
+            return keys
+        lengths = np.fromiter(map(len, quadkeys), dtype=np.int64, count=len(quadkeys))
+        for z in np.unique(lengths).tolist():
+            if z > MAX_ZOOM:
+                raise ValueError(f'''Integer quadkeys hold at most {MAX_ZOOM} zoom levels''')
+            idx = np.flatnonzero(lengths == z)
+            group = [quadkeys[i] for i in idx.tolist()] if len(idx) < len(quadkeys) else quadkeys
+            digits = np.frombuffer("".join(group).encode('ascii'), dtype=np.uint8).reshape(len(idx), z) - 48
+            if digits.size and digits.max() > 3:
+                raise ValueError("Quadkeys may only hold the digits 0-3")
+            weights = np.int64(1) << (2 * np.arange(z - 1, -1, -1, dtype=np.int64))
+            keys[idx] = (np.int64(1) << (2 * z)) | (digits.astype(np.int64) @ weights if z else 0)
+        return keys
+
+    def to_strings(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        zoom = key_zoom(keys)
+        out = [None] * len(keys)
+        for z in np.unique(zoom).tolist():
+            idx = np.flatnonzero(zoom == z)
+            if z == 0:
+                for i in idx.tolist():
+                    out[i] = ''
+                continue
+            shifts = 2 * np.arange(z - 1, -1, -1, dtype=np.int64)
+            digits = ((keys[idx, None] >> shifts) & 3).astype(np.uint8) + 48
+            strings = digits.view(f'''S{z}''').ravel().astype(str).tolist()
+            if len(idx) == len(keys):
+                return strings
+            for i, s in zip(idx.tolist(), strings):
+                out[i] = s
+        return out
+
+
+_codecs = dict()
+
+
+def codec(scheme):
+    # Shared codec per tile scheme class
+    key = type(scheme)
+    if key not in _codecs:
+        _codecs[key] = QuadkeyCodec(scheme)
+    return _codecs[key]
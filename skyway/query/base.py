@@ -1,4 +1,6 @@
-import itertools
+import threading
+import weakref
+
 
 class BaseSetting:
     def __init_subclass__(cls, param_name, **kwargs):
@@ -19,161 +21,287 @@ class BaseSetting:
         return self._alias
 
 
-class Filter:
-    def _fmt(self):
+# Query AST nodes are immutable and hash-consed: building a node whose class
+# and fields match a live one returns that same object. Structural equality is
+# therefore identity, hashes are computed once, and formatted output is cached
+# on the node, so nodes work directly as cache and dedupe keys.
+_interned = weakref.WeakValueDictionary()
+_intern_lock = threading.Lock()
+
+
+def _typed(value):
+    # Values that compare equal across types (1, 1.0, True) must not share a
+    # node, so the intern key carries each value's type
+    if type(value) is tuple:
+        return (tuple, tuple(map(_typed, value)))
+    return (type(value), value)
+
+
+def _unpickle(cls, values):
+    return cls._make(*values)
+
+
+def _unpickle_chain(cls, items):
+    return cls._chain(items)
+
+
+class Node:
+    __slots__ = ('_hash', '_fmt_cache', '__weakref__')
+    _fields = ()
+
+    @classmethod
+    def _make(cls, *values):
+        key = (cls,) + tuple(map(_typed, values))
+        with _intern_lock:
+            node = _interned.get(key)
+            if node is None:
+                node = object.__new__(cls)
+                for name, value in zip(cls._fields, values):
+                    object.__setattr__(node, name, value)
+                object.__setattr__(node, '_hash', hash(key))
+                object.__setattr__(node, '_fmt_cache', None)
+                _interned[key] = node
+        return node
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'''{type(self).__name__} is immutable''')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'''{type(self).__name__} is immutable''')
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+    def __reduce__(self):
+        return (_unpickle, (type(self), self._values()))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def _format(self):
         raise NotImplementedError
 
+    def _fmt(self):
+        if self._fmt_cache is None:
+            object.__setattr__(self, '_fmt_cache', self._format())
+        return self._fmt_cache
+
+
+class _Chain(Node):
+    # Persistent left-deep list: each node holds the chain before it and one
+    # item, so appending is O(1) and shares the whole prefix. The flattened
+    # items are built once, on first use.
+    __slots__ = ('_head', '_last', '_items')
+    _fields = ('_head', '_last')
+
+    @classmethod
+    def _chain(cls, items, node=None):
+        if node is None:
+            node = cls._make(None, None)
+        for item in items:
+            node = cls._make(node if node._last is not None else None, item)
+        return node
+
+    @property
+    def _flat(self):
+        items = getattr(self, '_items', None)
+        if items is None:
+            tail, node = [], self
+            while node is not None and node._last is not None and getattr(node, '_items', None) is None:
+                tail.append(node._last)
+                node = node._head
+            prefix = getattr(node, '_items', None) or ()
+            items = prefix + tuple(reversed(tail))
+            object.__setattr__(self, '_items', items)
+        return items
+
+    def __iter__(self):
+        return iter(self._flat)
+
+    def __len__(self):
+        return len(self._flat)
+
+    def __reduce__(self):
+        # Pickled as the flat items, not the nested heads, so long chains
+        # don't hit the recursion limit
+        return (_unpickle_chain, (type(self), self._flat))
+
+
+def _as_filter(other):
+    if isinstance(other, str):
+        from .filters import UserFilter
+        return UserFilter(other)
+    if isinstance(other, (Filter, CompoundFilter)):
+        return other
+    raise NotImplementedError
+
+
+class Filter(Node):
+    __slots__ = ()
+
     def __repr__(self):
         return self._fmt()
 
     def __add__(self, other):
-        if isinstance(other, str):
-            other = UserFilter(other)
-        if isinstance(other, Filter):
-            return CompoundFilter([self, other])
-        if isinstance(other, CompoundFilter):
-            filters = [f for f in other.filters]
-            filters.append(self)
-            return CompoundFilter(filters)
-        else:
-            raise NotImplementedError
+        return CompoundFilter._chain((self,)) + other
 
     def __radd__(self, other):
-        return self.__add__(other)
+        return _as_filter(other) + self
 
-    def __iadd__(self, other):
-        return self.__add__(other)
 
+class CompoundFilter(_Chain):
+    __slots__ = ()
 
-class CompoundFilter:
-    def __init__(self, filters=[]):
-        self._filters = filters
+    def __new__(cls, filters=()):
+        node = cls._chain(())
+        for f in filters:
+            node = node + f
+        return node
 
     @property
     def filters(self):
-        return self._filters
-
-    @filters.setter
-    def filters(self, filters):
-        if not self._filters:
-            self._filters = filters
-        else:
-            raise AttributeError("Delete existing filters before assignment")
-
-    @filters.deleter
-    def filters(self):
-        self._filters = []
-
-    def __iter__(self):
-        return iter(self.filters)
+        return self._flat
 
     def __repr__(self):
-        return f'''{"".join(f._fmt() for f in self.filters)}'''
+        return self._fmt()
+
+    def _format(self):
+        return "".join(f._fmt() for f in self.filters)
 
+    # add_filter and += used to extend the filter in place. Filters are
+    # immutable now, so rather than quietly leave the filter as it was they
+    # raise, pointing at the rebinding form
     def add_filter(self, other):
-        if isinstance(other, str):
-            other = UserFilter(other)
-        if isinstance(other, Filter):
-            self._filters.append(other)
-            return
-        if isinstance(other, CompoundFilter):
-            self._filters.extend(other.filters)
-            return
-        else:
-            raise NotImplementedError
+        raise TypeError("CompoundFilter is immutable; use cf = cf + other")
+
+    def __iadd__(self, other):
+        raise TypeError("CompoundFilter is immutable; use cf = cf + other")
 
     def __add__(self, other):
-        if isinstance(other, str):
-            other = UserFilter(other)
-        if isinstance(other, Filter):
-            filters = [f for f in self.filters]
-            filters.append(other)
-            return CompoundFilter(filters)
+        other = _as_filter(other)
         if isinstance(other, CompoundFilter):
-            filters = list(itertools.chain(self.filters, other.filters))
-            return CompoundFilter(filters)
-        else:
-            raise NotImplementedError
+            return CompoundFilter._chain(other.filters, self)
+        return CompoundFilter._chain((other,), self)
 
     def __radd__(self, other):
-        return self.__add__(other)
+        return CompoundFilter._chain((_as_filter(other),)) + self
 
-    def __iadd__(self, other):
-        self.add_filter(other)
-        return self
 
+class AbstractQueryStatement(Node):
+    __slots__ = ()
 
-class AbstractQueryStatement:
     def _fmt_statement(self):
         raise NotImplementedError
 
-    def __repr__(self):
+    def _format(self):
         return f'''{self._fmt_statement()};'''
 
+    def __repr__(self):
+        return self._fmt()
+
     def __add__(self, other):
         if isinstance(other, AbstractQueryStatement):
-            return UnionQuerySet([self, other])
+            return UnionQuerySet((self, other))
         raise NotImplementedError
 
     def __radd__(self, other):
         return self.__add__(other)
 
-    def __iadd__(self, other):
-        return self.__add__(other)
-
     def __sub__(self, other):
         if isinstance(other, AbstractQueryStatement):
             # Check output type match
-            return DifferenceQuerySet([self, other])
+            return DifferenceQuerySet((self, other))
         raise NotImplementedError
 
     def __rsub__(self, other):
         return NotImplemented
 
-    def __isub__(self, other):
-        return self.__sub__(other)
-
     def union(self, other):
         return self + other
 
     def difference(self, other):
         return self - other
 
+    # += and -= always rebound to a new statement, and still do; iunion and
+    # idifference never reached the caller's statement, so they raise
+    def __iadd__(self, other):
+        return self + other
+
+    def __isub__(self, other):
+        return self - other
+
     def iunion(self, other):
-        self += other
+        raise TypeError("Query statements are immutable; use qs = qs + other")
 
     def idifference(self, other):
-        self -= other
+        raise TypeError("Query statements are immutable; use qs = qs - other")
 
 
 class BaseQueryElement(AbstractQueryStatement):
-    def __repr__(self):
-        return f'''{self._fmt_statement()};'''
+    __slots__ = ()
 
 
 class BaseQuerySet(AbstractQueryStatement):
-    def __repr__(self):
+    __slots__ = ()
+
+    def _format(self):
         return f'''({self._fmt_statement()});'''
 
 
-class UnionQuerySet(BaseQuerySet):
-    def __init__(self, query_statements=[]):
-        self.query_statements = query_statements
+class UnionQuerySet(_Chain, BaseQuerySet):
+    __slots__ = ()
+
+    def __new__(cls, query_statements=()):
+        return cls._chain(query_statements)
+
+    @property
+    def query_statements(self):
+        return self._flat
 
     def _fmt_statement(self):
-        return f'''{"".join(qf._fmt_statement() for qf in self.query_statements)}'''
+        return "".join(qs._fmt() for qs in self.query_statements)
 
-    def __iter__(self):
-        return iter(self.query_statements)
+    def __add__(self, other):
+        if isinstance(other, UnionQuerySet):
+            return UnionQuerySet._chain(other.query_statements, self)
+        if isinstance(other, AbstractQueryStatement):
+            return UnionQuerySet._chain((other,), self)
+        raise NotImplementedError
 
 
 class DifferenceQuerySet(BaseQuerySet):
-    def __init__(self, query_statements=[]):
+    __slots__ = ('minued', 'subtrahend')
+    _fields = ('minued', 'subtrahend')
+
+    def __new__(cls, query_statements=()):
         assert len(query_statements) == 2
-        self.minued, self.subtrahend = query_statements
+        return cls._make(*query_statements)
 
     def _fmt_statement(self):
-        return f'''{self.minued} - {self.subtrahend}'''
+        return f'''{self.minued._fmt()} - {self.subtrahend._fmt()}'''
 
 
+class ElementStatement(BaseQueryElement):
+    # <elmtype><filters>; e.g. nwr[amenity=bench](40.00,-70.00,40.10,-69.90);
+    __slots__ = ('elmtype', 'filters')
+    _fields = ('elmtype', 'filters')
 
+    def __new__(cls, elmtype, filters=()):
+        if not isinstance(filters, CompoundFilter):
+            filters = CompoundFilter(filters)
+        return cls._make(elmtype, filters)
+
+    def _fmt_statement(self):
+        return f'''{self.elmtype}{self.filters._fmt()}'''
@@ -0,0 +1,187 @@
+import copy
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .base import ElementStatement
+from .filters import BboxFilter
+from .client import OverpassError
+from .optimize import optimize_statement
+from .parse import iter_elements, element_geometry, Element
+from .executor import _splittable
+
+
+# Type of the derived element marking the start of each tile's output
+MARKER = 'skyway_tile'
+
+# Server side limits when a query does not set its own
+DEFAULT_TIMEOUT = 180
+DEFAULT_MAXSIZE = 512 << 20
+
+
+def tile_bboxes(tiles):
+    # (quadkey, (s, w, n, e)) pairs from a TileCollection, a TileArray, a
+    # {quadkey: bbox} mapping or an iterable of such pairs
+    tiles = getattr(tiles, 'tiles', tiles)
+    if hasattr(tiles, 'quadkeys') and hasattr(tiles, 'bounds'):
+        return [(qk, (float(s), float(w), float(n), float(e)))
+                for qk, (w, s, e, n) in zip(tiles.quadkeys, tiles.bounds().tolist())]
+    if hasattr(tiles, 'items'):
+        tiles = tiles.items()
+    return [(qk, tuple(bbox)) for qk, bbox in tiles]
+
+
+class TileBatchQuery:
+    # A single Overpass script running a GeomQueryBuilder's statement once per
+    # tile. Each tile's result goes to its own named set and output block,
+    # preceded by a `make skyway_tile quadkey=...` marker element that
+    # iter_tiles splits the response on.
+
+    def __init__(self, builder, tiles):
+        self.builder = builder
+        self.tiles = tile_bboxes(tiles)
+
+    def _settings(self):
+        settings = copy.deepcopy(self.builder.settings)
+        settings.payload_format = "json"
+        # Each statement has its own tile bbox, which overrides a global one
+        settings.bbox = None
+        return settings
+
+    def _statement(self, bbox):
+        stmt = self.builder.query.statement
+        stmt = ElementStatement(stmt.elmtype, stmt.filters + BboxFilter(bbox))
+        return optimize_statement(stmt) if self.builder.optimize else stmt
+
+    def ql(self):
+        parts = [repr(self._settings())]
+        for i, (quadkey, bbox) in enumerate(self.tiles):
+            stmt = self._statement(bbox)._fmt_statement()
+            parts.append(f'''make {MARKER} quadkey="{quadkey}";out;{stmt}->.t{i};.t{i} out geom;''')
+        return "".join(parts)
+
+    def __repr__(self):
+        return self.ql()
+
+
+def iter_tiles(source, chunk_size=1 << 16):
+    # Split a TileBatchQuery response into (quadkey, [element dicts]) pairs.
+    # A tile is yielded once the next marker shows its output is complete,
+    # the last one when the response ends without a runtime error remark.
+    quadkey, elements = None, []
+    for el in iter_elements(source, chunk_size=chunk_size):
+        if el.get('type') == MARKER:
+            if quadkey is not None:
+                yield quadkey, elements
+            quadkey, elements = el['tags']['quadkey'], []
+        elif quadkey is not None:
+            elements.append(el)
+    if quadkey is not None:
+        yield quadkey, elements
+
+
+class TileBatchExecutor:
+    # Runs a GeomQueryBuilder over many tiles in as few requests as possible.
+    # Tiles are packed into TileBatchQuery scripts sized from the response
+    # bytes and seconds per tile seen so far, so that a batch uses at most
+    # fill of the query's [maxsize:] and [timeout:] (or the server defaults).
+    # When a batch fails with a timeout or size error its unfinished tiles
+    # are requeued and later batches are capped at half its size. Results
+    # are yielded per tile as (quadkey, elements) in completion order.
+
+    def __init__(self, client=None, max_workers=2, initial_batch=8, max_batch=1024, fill=0.5):
+        self.client = client
+        self.max_workers = max_workers
+        self.initial_batch = initial_batch
+        self.max_batch = max_batch
+        self.fill = fill
+        self.requests = 0
+        self.failed = []
+        self._cap = max_batch
+        # Running averages per tile, kept across runs
+        self._bytes = None
+        self._secs = None
+
+    def batch_size(self, builder):
+        if self._bytes is None:
+            return min(self._cap, self.initial_batch)
+        n = self._cap
+        maxsize = builder.settings.maxsize or DEFAULT_MAXSIZE
+        timeout = builder.settings.timeout or DEFAULT_TIMEOUT
+        if self._bytes > 0:
+            n = min(n, int(self.fill * maxsize / self._bytes))
+        if self._secs > 0:
+            n = min(n, int(self.fill * timeout / self._secs))
+        return max(1, n)
+
+    def _observe(self, ntiles, nbytes, secs, alpha=0.3):
+        per_bytes, per_secs = nbytes / ntiles, secs / ntiles
+        if self._bytes is None:
+            self._bytes, self._secs = per_bytes, per_secs
+        else:
+            self._bytes += alpha * (per_bytes - self._bytes)
+            self._secs += alpha * (per_secs - self._secs)
+
+    def _fetch(self, builder, batch):
+        # (finished tiles, error or None, response bytes, seconds)
+        client = builder._client(self.client)
+        nbytes, done = 0, []
+
+        def counted(chunks):
+            nonlocal nbytes
+            for chunk in chunks:
+                nbytes += len(chunk)
+                yield chunk
+
+        start = time.monotonic()
+        try:
+            for item in iter_tiles(counted(client.stream(TileBatchQuery(builder, batch).ql()))):
+                done.append(item)
+        except OverpassError as e:
+            return done, e, nbytes, time.monotonic() - start
+        return done, None, nbytes, time.monotonic() - start
+
+    def run(self, builder, tiles):
+        queue = deque(tile_bboxes(tiles))
+        self.requests = 0
+        self.failed = []
+        self._cap = self.max_batch
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = dict()
+
+            def submit():
+                while queue and len(pending) < self.max_workers:
+                    n = min(self.batch_size(builder), len(queue))
+                    batch = [queue.popleft() for _ in range(n)]
+                    pending[pool.submit(self._fetch, builder, batch)] = batch
+                    self.requests += 1
+
+            submit()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    batch = pending.pop(fut)
+                    done, error, nbytes, secs = fut.result()
+                    yield from done
+                    if error is None:
+                        self._observe(len(batch), nbytes, secs)
+                        continue
+                    finished_qks = set(qk for qk, _ in done)
+                    rest = [t for t in batch if t[0] not in finished_qks]
+                    # Limits apply to the whole script, so only a tile that
+                    # fails on its own is beyond help
+                    if not _splittable(error) or len(batch) <= 1:
+                        raise error
+                    self.failed.append(len(batch))
+                    self._cap = max(1, min(self._cap, len(batch) // 2))
+                    queue.extendleft(reversed(rest))
+                submit()
+
+    def features(self, builder, tiles):
+        for quadkey, elements in self.run(builder, tiles):
+            features = []
+            for el in elements:
+                g = element_geometry(el)
+                if g is not None:
+                    features.append(Element(el['type'], el['id'], el.get('tags', {}), g))
+            yield quadkey, features
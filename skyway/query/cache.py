@@ -0,0 +1,266 @@
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "skyway", "overpass")
+
+_string_regex = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')''')
+_comment_regex = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+_punct_regex = re.compile(r'\s*([;\[\](){}=,:<>!~.\-])\s*')
+_date_regex = re.compile(r'\[\s*date\s*:')
+
+
+def canonical_query(query):
+    # Whitespace and comment insensitive form of an Overpass QL query; string
+    # literals are left untouched
+    parts = _string_regex.split(query)
+    for i in range(0, len(parts), 2):
+        part = _comment_regex.sub(' ', parts[i])
+        part = re.sub(r'\s+', ' ', part)
+        parts[i] = _punct_regex.sub(r'\1', part)
+    return "".join(parts).strip()
+
+
+def is_pinned(query):
+    # Queries against a fixed [date:...] snapshot never change
+    return _date_regex.search("".join(_string_regex.split(query)[::2])) is not None
+
+
+class _Writer:
+    def __init__(self, cache, query):
+        self.cache = cache
+        self.query = query
+        self.key = cache.key(query)
+        self.expires = cache.expires(query)
+        self._mem = []
+        self._size = 0
+        self._tmp = None
+        if cache.path is not None:
+            fd, self._tmp = tempfile.mkstemp(dir=cache.path, suffix=".part")
+            self._f = os.fdopen(fd, "wb")
+            self._f.write(json.dumps({"expires": self.expires}).encode() + b"\n")
+
+    def write(self, chunk):
+        if self._tmp is not None:
+            self._f.write(chunk)
+        if self._mem is not None:
+            self._size += len(chunk)
+            if self._size > self.cache.max_item_bytes:
+                self._mem = None
+            else:
+                self._mem.append(chunk)
+
+    def commit(self):
+        if self._tmp is not None:
+            self._f.close()
+            path = self.cache._file(self.key)
+            size = os.path.getsize(self._tmp)
+            try:
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(self._tmp, path)
+            self._tmp = None
+            self.cache._stored(size)
+        if self._mem is not None:
+            self.cache._remember(self.key, self.expires, b"".join(self._mem))
+
+    def abort(self):
+        if self._tmp is not None:
+            self._f.close()
+            os.remove(self._tmp)
+            self._tmp = None
+
+
+class ResponseCache:
+    # Two tier cache of raw Overpass response bodies keyed on the sha256 of the
+    # canonical query text: an in-memory LRU of up to max_items bodies no
+    # larger than max_item_bytes and max_bytes in all, backed by one file per
+    # entry under path (path=None keeps it memory only). Entries expire after
+    # ttl seconds, except queries pinned with a [date:...] setting which are
+    # kept forever. Once the files outgrow max_disk_bytes, prune() deletes the
+    # expired ones and then the least recently used.
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, ttl=24 * 3600, max_items=256, max_item_bytes=8 << 20,
+                 max_bytes=256 << 20, max_disk_bytes=1 << 30):
+        self.path = path
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_item_bytes = max_item_bytes
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        # Bytes on disk, counted by the first prune()
+        self._disk_bytes = None
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self._mem = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, query):
+        return hashlib.sha256(canonical_query(query).encode("utf-8")).hexdigest()
+
+    def expires(self, query):
+        if self.ttl is None or is_pinned(query):
+            return None
+        return time.time() + self.ttl
+
+    def _file(self, key):
+        return os.path.join(self.path, key)
+
+    @staticmethod
+    def _live(expires):
+        return expires is None or expires > time.time()
+
+    def _forget(self, key):
+        # Caller holds the lock
+        entry = self._mem.pop(key, None)
+        if entry is not None:
+            self._mem_bytes -= len(entry[1])
+
+    def _remember(self, key, expires, body):
+        with self._lock:
+            self._forget(key)
+            self._mem[key] = (expires, body)
+            self._mem_bytes += len(body)
+            while self._mem and (len(self._mem) > self.max_items or self._mem_bytes > self.max_bytes):
+                self._forget(next(iter(self._mem)))
+
+    def open(self, query):
+        # Binary file object positioned at the cached body, or None on a miss
+        key = self.key(query)
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and self._live(entry[0]):
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return io.BytesIO(entry[1])
+            self._forget(key)
+        if self.path is not None:
+            try:
+                f = open(self._file(key), "rb")
+            except FileNotFoundError:
+                pass
+            else:
+                expires = json.loads(f.readline())["expires"]
+                if self._live(expires):
+                    with self._lock:
+                        self.hits += 1
+                        self.disk_hits += 1
+                    # The file's mtime is its last use, for prune()
+                    os.utime(f.fileno())
+                    size = os.fstat(f.fileno()).st_size - f.tell()
+                    if size <= self.max_item_bytes:
+                        body = f.read()
+                        f.close()
+                        self._remember(key, expires, body)
+                        return io.BytesIO(body)
+                    return f
+                f.close()
+                self._remove(key)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get(self, query):
+        f = self.open(query)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def writer(self, query):
+        # Incremental writer for streamed bodies; commit() once complete
+        return _Writer(self, query)
+
+    def put(self, query, body):
+        w = self.writer(query)
+        w.write(body)
+        w.commit()
+
+    def invalidate(self, query=None):
+        # Drop one query, or everything when query is None
+        with self._lock:
+            if query is None:
+                self._mem.clear()
+                self._mem_bytes = 0
+            else:
+                self._forget(self.key(query))
+        if self.path is None:
+            return
+        keys = self._keys() if query is None else [self.key(query)]
+        for key in keys:
+            self._remove(key)
+
+    def _keys(self):
+        # Committed entries; .part files belong to writers still streaming
+        return [name for name in os.listdir(self.path) if not name.endswith(".part")]
+
+    def _remove(self, key):
+        try:
+            size = os.path.getsize(self._file(key))
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def _stored(self, size):
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            over = self._disk_bytes is None or (self.max_disk_bytes is not None
+                                                and self._disk_bytes > self.max_disk_bytes)
+        if over:
+            self.prune()
+
+    def prune(self):
+        # Delete expired files, then the least recently used until the rest
+        # fit in max_disk_bytes; returns how many were deleted
+        if self.path is None:
+            return 0
+        entries, removed = [], 0
+        for key in self._keys():
+            try:
+                with open(self._file(key), "rb") as f:
+                    expires = json.loads(f.readline())["expires"]
+                    st = os.fstat(f.fileno())
+            except (FileNotFoundError, ValueError, KeyError):
+                continue
+            if self._live(expires):
+                entries.append((st.st_mtime, st.st_size, key))
+            else:
+                self._remove(key)
+                removed += 1
+        total = sum(size for _, size, _ in entries)
+        if self.max_disk_bytes is not None and total > self.max_disk_bytes:
+            for _, size, key in sorted(entries):
+                if total <= self.max_disk_bytes:
+                    break
+                self._remove(key)
+                total -= size
+                removed += 1
+        with self._lock:
+            self._disk_bytes = total
+        return removed
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._mem),
+                "memory_bytes": self._mem_bytes}
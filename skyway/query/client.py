@@ -0,0 +1,271 @@
+import io
+import os
+import re
+import time
+import random
+import threading
+from functools import partial
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .. import metrics
+from .cache import ResponseCache
+
+
+OVERPASS_ENDPOINTS = (
+    'http://overpass-api.de/api/interpreter',
+)
+
+_slot_regex = re.compile(r'in (\d+) seconds')
+
+
+class OverpassError(Exception):
+    def __init__(self, message, status_code=None, endpoint=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.endpoint = endpoint
+
+
+class _ChunkReader(io.RawIOBase):
+    # Read-only file object over an iterator of byte chunks
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            self._buf = next(self._chunks, b'')
+            if not self._buf:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+        super().close()
+
+
+def _cached_response(body, url):
+    r = requests.models.Response()
+    r.status_code = 200
+    r._content = body
+    r.encoding = 'utf-8'
+    r.url = url
+    r.headers['X-Skyway-Cache'] = 'hit'
+    return r
+
+
+class OverpassClient:
+    # Pooled keep-alive sessions over one or more Overpass interpreter
+    # endpoints. Requests go to whichever endpoint is available soonest;
+    # 429/5xx and connection failures push that endpoint back by the server's
+    # Retry-After (or /api/status slot time), or by exponential backoff with
+    # jitter, and the request moves on to the next endpoint.
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self,
+                 endpoints=OVERPASS_ENDPOINTS,
+                 timeout=(10, 600),
+                 max_retries=5,
+                 backoff=1.0,
+                 max_backoff=120.0,
+                 pool_maxsize=16,
+                 chunk_size=1 << 16,
+                 session=None,
+                 cache=None):
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        self.endpoints = list(endpoints)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.chunk_size = chunk_size
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        # Optional ResponseCache consulted before every request
+        self.cache = cache
+        self._not_before = [0.0] * len(self.endpoints)
+        self._lock = threading.Lock()
+
+    def _pick(self):
+        with self._lock:
+            i = min(range(len(self.endpoints)), key=self._not_before.__getitem__)
+            return i, self._not_before[i]
+
+    def _defer(self, i, delay):
+        with self._lock:
+            self._not_before[i] = max(self._not_before[i], time.monotonic() + delay)
+
+    def _backoff(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay * (0.5 + random.random() / 2)
+
+    def _retry_after(self, response):
+        hint = response.headers.get('Retry-After')
+        if hint is None:
+            return None
+        try:
+            return max(0.0, float(hint))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(hint).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _slot_delay(self, endpoint):
+        # Overpass publishes per-client slot availability at /api/status
+        try:
+            r = self.session.get(endpoint.rsplit('/', 1)[0] + '/status', timeout=self.timeout)
+        except requests.RequestException:
+            return None
+        waits = [int(s) for s in _slot_regex.findall(r.text)]
+        return min(waits) if waits else None
+
+    def _post(self, query, stream=False, no_retry=()):
+        # Statuses in no_retry are raised on the first response, for callers
+        # with a better remedy than waiting
+        attempt = 0
+        while True:
+            i, not_before = self._pick()
+            wait = not_before - time.monotonic()
+            if wait > 0:
+                with metrics.span('overpass.wait'):
+                    time.sleep(wait)
+            endpoint = self.endpoints[i]
+            try:
+                with metrics.span('overpass.request'):
+                    r = self.session.post(endpoint, data=query.encode('utf-8'),
+                                          timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = OverpassError(str(e), endpoint=endpoint)
+                metrics.count('overpass.errors')
+                delay = self._backoff(attempt)
+            else:
+                if r.status_code == 200:
+                    return r
+                error = OverpassError(f'''{r.status_code} from {endpoint}: {r.text[:512]}''',
+                                      status_code=r.status_code, endpoint=endpoint)
+                metrics.count('overpass.errors')
+                r.close()
+                if r.status_code not in self.retry_statuses or r.status_code in no_retry:
+                    raise error
+                delay = self._retry_after(r)
+                if delay is None and r.status_code == 429:
+                    delay = self._slot_delay(endpoint)
+                if delay is None:
+                    delay = self._backoff(attempt)
+            if attempt >= self.max_retries:
+                raise error
+            metrics.count('overpass.retries')
+            self._defer(i, delay)
+            attempt += 1
+
+    def _cached(self, query):
+        if self.cache is None:
+            return None
+        f = self.cache.open(query)
+        if f is not None:
+            metrics.count('overpass.cache_hits')
+        return f
+
+    @staticmethod
+    def _cacheable(tail):
+        # Overpass reports timeouts and memory errors as a remark at the end
+        # of an otherwise successful body; those must not be cached
+        return b'remark' not in tail
+
+    def request(self, query):
+        # Full response, body buffered
+        f = self._cached(query)
+        if f is not None:
+            with f:
+                return _cached_response(f.read(), self.endpoints[0])
+        r = self._post(query)
+        metrics.count('overpass.bytes', len(r.content))
+        if self.cache is not None and self._cacheable(r.content[-4096:]):
+            self.cache.put(query, r.content)
+        return r
+
+    def json(self, query):
+        return self.request(query).json()
+
+    def stream(self, query, chunk_size=None, no_retry=()):
+        # Yield the response body in chunks without buffering it; see _post
+        # for no_retry
+        chunk_size = chunk_size or self.chunk_size
+        f = self._cached(query)
+        if f is not None:
+            with f:
+                yield from iter(partial(f.read, chunk_size), b'')
+            return
+        r = self._post(query, stream=True, no_retry=no_retry)
+        writer = self.cache.writer(query) if self.cache is not None else None
+        tail = b''
+        try:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                metrics.count('overpass.bytes', len(chunk))
+                if writer is not None:
+                    writer.write(chunk)
+                    tail = (tail + chunk)[-4096:]
+                yield chunk
+            if writer is not None and self._cacheable(tail):
+                writer.commit()
+                writer = None
+        finally:
+            if writer is not None:
+                writer.abort()
+            r.close()
+
+    def open(self, query):
+        # File-like body for incremental parsers; close when done
+        return io.BufferedReader(_ChunkReader(self.stream(query)))
+
+    def download(self, query, path, chunk_size=None):
+        # Stream the response to path, renaming into place once complete
+        tmp = f'''{path}.part'''
+        try:
+            with open(tmp, 'wb') as f:
+                for chunk in self.stream(query, chunk_size=chunk_size):
+                    f.write(chunk)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return path
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_default_client = None
+
+
+def default_client():
+    # Shared client for builders given none; it keeps recent responses in a
+    # bounded in-memory cache, so repeating a query within the hour doesn't
+    # go back to the server. Pass a client of your own to change that.
+    global _default_client
+    if _default_client is None:
+        _default_client = OverpassClient(cache=ResponseCache(path=None, ttl=3600))
+    return _default_client
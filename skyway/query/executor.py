@@ -0,0 +1,116 @@
+import copy
+import math
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import tiletanic as tt
+
+from .client import OverpassError
+from .filters import BboxFilter
+from .parse import OverpassRuntimeError, iter_elements, element_geometry, Element
+
+
+# Statuses that a smaller bbox can fix, as opposed to bad queries
+_SPLIT_STATUSES = (504, 507)
+
+
+def _splittable(error):
+    if isinstance(error, OverpassRuntimeError):
+        return True
+    return isinstance(error, OverpassError) and error.status_code in _SPLIT_STATUSES
+
+
+class SplitQueryExecutor:
+    # Runs a GeomQueryBuilder over its bbox as a set of quadkey sub-queries on
+    # the WGS84 (DG) quadtree. Tiles are sized so none spans more than
+    # max_span degrees, fetched concurrently, and any tile that fails with a
+    # timeout or size error is replaced by its four children down to
+    # min_span. Elements are yielded as tiles complete, once per OSM id.
+
+    def __init__(self, client=None, max_workers=4, max_span=0.25, min_span=0.02):
+        self.client = client
+        self.max_workers = max_workers
+        self.max_span = max_span
+        self.min_span = min_span
+        self.tiler = tt.tileschemes.DGTiling()
+        self.failed = []
+
+    def _zoom_for_span(self, span):
+        return max(1, math.ceil(math.log2(360. / span)))
+
+    def cover(self, bbox):
+        # Quadkey tiles covering a (s, w, n, e) bbox at the max_span zoom
+        s, w, n, e = bbox
+        zoom = self._zoom_for_span(self.max_span)
+        x0, x1 = self.tiler._x(w, zoom), self.tiler._x(e, zoom)
+        y0, y1 = self.tiler._y(s, zoom), self.tiler._y(n, zoom)
+        return [tt.base.Tile(x, y, zoom) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def _clip(self, tile, bbox):
+        s, w, n, e = bbox
+        tb = self.tiler.bbox(tile)
+        clipped = (max(s, tb.ymin), max(w, tb.xmin), min(n, tb.ymax), min(e, tb.xmax))
+        if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+            return None
+        return clipped
+
+    def _subquery(self, builder, bbox):
+        sub = copy.copy(builder)
+        sub.settings = copy.deepcopy(builder.settings)
+        sub.settings.bbox = bbox
+        return sub
+
+    def _fetch(self, builder, bbox, splittable):
+        # A tile that can still be split is split on its first timeout
+        # rather than after the client's retries and backoff
+        client = builder._client(self.client)
+        no_retry = _SPLIT_STATUSES if splittable else ()
+        return list(iter_elements(client.stream(self._subquery(builder, bbox).ql(), no_retry=no_retry)))
+
+    def run(self, builder):
+        # A statement bbox overrides the [bbox:] setting of every sub-query,
+        # so it is lifted into the setting the split works from
+        builder = builder.optimized() if builder.optimize else builder.lifted()
+        if any(isinstance(f, BboxFilter) for f in builder.query.statement.filters):
+            raise ValueError("SplitQueryExecutor cannot lift the statement's bbox filters; "
+                             "intersect them into one or set optimize")
+        bbox = builder.settings.bbox
+        if bbox is None:
+            raise ValueError("SplitQueryExecutor needs a query with a bbox setting")
+        seen = set()
+        self.failed = []
+        min_zoom = self._zoom_for_span(self.min_span)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = dict()
+
+            def submit(tile):
+                sub_bbox = self._clip(tile, bbox)
+                if sub_bbox is not None:
+                    pending[pool.submit(self._fetch, builder, sub_bbox, tile.z < min_zoom)] = tile
+
+            for tile in self.cover(bbox):
+                submit(tile)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    tile = pending.pop(fut)
+                    try:
+                        elements = fut.result()
+                    except OverpassError as e:
+                        if not _splittable(e) or tile.z >= min_zoom:
+                            raise
+                        self.failed.append(self.tiler.quadkey(tile))
+                        for child in self.tiler.children(tile):
+                            submit(child)
+                        continue
+                    for el in elements:
+                        key = (el['type'], el['id'])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        yield el
+
+    def features(self, builder):
+        for el in self.run(builder):
+            g = element_geometry(el)
+            if g is not None:
+                yield Element(el['type'], el['id'], el.get('tags', {}), g)
@@ -1,55 +1,69 @@
-from .base import Filter
+from .base import Node, Filter
 
 class GenericFilter(Filter):
-    pass
+    __slots__ = ()
 
 class UserFilter(GenericFilter):
-    def __init__(self, filterstring):
-        self._fs = filterstring
+    __slots__ = ('_fs',)
+    _fields = ('_fs',)
 
-    def _fmt(self):
+    def __new__(cls, filterstring):
+        return cls._make(filterstring)
+
+    def _format(self):
         return self._fs
 
 
 class IdFilter(GenericFilter):
-    def __init__(self, _id):
-        self._id = _id
+    __slots__ = ('_id',)
+    _fields = ('_id',)
+
+    def __new__(cls, _id):
+        if isinstance(_id, list):
+            _id = tuple(_id)
+        return cls._make(_id)
 
     @property
     def id(self):
         return self._id
 
-    @id.setter
-    def id(self, val):
-        self._id = val
-
-    def _fmt(self):
+    def _format(self):
+        if isinstance(self.id, tuple):
+            return f'''(id:{",".join(str(i) for i in self.id)})'''
         return f'''(id:{self.id})'''
 
 
 class BboxFilter(GenericFilter):
-    def __init__(self, bbox):
-        self.bbox = bbox
+    __slots__ = ('bbox',)
+    _fields = ('bbox',)
+
+    def __new__(cls, bbox):
+        return cls._make(tuple(bbox))
 
-    def _fmt(self):
+    def _format(self):
         s, w, n, e = self.bbox
-        return f'''({s:.2f},{w:.2f},{n:.2f},{e:.2f})'''
+        return f'''({s:.7f},{w:.7f},{n:.7f},{e:.7f})'''
 
 
-class KeySpec:
-    def __init__(self, key, exists=True):
+class KeySpec(Node):
+    __slots__ = ('key', 'exists')
+    _fields = ('key', 'exists')
+
+    def __new__(cls, key, exists=True):
         if key.startswith("!"):
             if not exists:
                 raise AttributeError("Input existence conflict")
             key = key.strip("!")
             exists = False
-        self.key = key
-        self.exists = exists
+        return cls._make(key, exists)
 
     def __bool__(self):
         return self.exists
 
     def __repr__(self):
+        return self._fmt()
+
+    def _format(self):
         s = f'''{self.key}'''
         if not self.exists:
             return "!" + s
@@ -60,7 +74,7 @@ class KeySpec:
 def format_values(vals):
     if isinstance(vals, str):
         return f'''={vals}'''
-    if isinstance(vals, list):
+    if isinstance(vals, (list, tuple)):
         if len(vals) == 1:
             val = vals[0]
             return f'''={val}'''
@@ -70,31 +84,27 @@ def format_values(vals):
 
 
 class TagFilter(GenericFilter):
-    def __init__(self, key, vals=[], exists=True):
+    __slots__ = ('_key', '_vals', 'exists')
+    _fields = ('_key', '_vals', 'exists')
+
+    def __new__(cls, key, vals=(), exists=True):
+        if isinstance(vals, list):
+            vals = tuple(vals)
         if not vals:
-            self._key = KeySpec(key, exists=exists)
+            key = KeySpec(key, exists=exists)
         else:
-            self._key = KeySpec(key)
-        self._vals = vals
-        self.exists = exists
+            key = KeySpec(key)
+        return cls._make(key, vals, exists)
 
     @property
     def key(self):
         return self._key
 
-    @key.setter
-    def key(self, val):
-        self._key = KeySpec(key)
-
     @property
     def values(self):
         return self._vals
 
-    @values.setter
-    def values(self, vals):
-        self._vals = vals
-
-    def _fmt(self):
+    def _format(self):
         if not self.key.exists:
             return f'''[{self.key}]'''
         if not self.values:
@@ -103,7 +113,3 @@ class TagFilter(GenericFilter):
         if self.exists:
             return f'''[{self.key}{svals}]'''
         return f'''[{self.key}][{self.key}!{svals}]'''
-
-
-
-
@@ -0,0 +1,212 @@
+import re
+
+from .base import (Filter, CompoundFilter, AbstractQueryStatement, ElementStatement,
+                   UnionQuerySet, DifferenceQuerySet)
+from .filters import IdFilter, BboxFilter, TagFilter
+
+
+# Rewrites applied before a query is submitted. Every rewrite keeps the result
+# set identical; anything it cannot prove equivalent is left as written.
+#
+# Within a statement (filters are ANDed):
+#   - repeated filters are dropped
+#   - tag filters on the same key intersect their values, and [k] is implied
+#     by [k=v]
+#   - id filters intersect into one (id:...) filter, bboxes into one bbox
+#   - filters are put in a canonical order so equal statements intern to the
+#     same node
+# Across a union (members are ORed):
+#   - nested unions are flattened and repeated members dropped
+#   - members that differ only in the values of one tag filter become one
+#     member with a ~"^(a|b)$" filter, and members that differ only in ids
+#     one member with the compact (id:1,2,3) form
+# A bbox shared by every statement can be lifted into the global [bbox:]
+# setting with lift_bbox.
+
+# Values joined into a regex must match literally
+_regex_chars = re.compile(r'[\\^$.|?*+()\[\]{}"]')
+
+_EXISTS = object()
+
+
+def _tag_values(tf):
+    # Literal value set of a positive tag filter, _EXISTS for a bare [key],
+    # or None when the filter is negated or its values are a real regex
+    if not tf.exists or not tf.key.exists:
+        return None
+    if not tf.values:
+        return _EXISTS
+    vals = (tf.values,) if isinstance(tf.values, str) else tuple(tf.values)
+    if len(vals) > 1 and any(_regex_chars.search(v) for v in vals):
+        return None
+    return frozenset(vals)
+
+
+def _tag_filter(key, vals):
+    if vals is _EXISTS:
+        return TagFilter(key)
+    return TagFilter(key, vals=tuple(sorted(vals)))
+
+
+def _id_values(f):
+    return frozenset(f.id if isinstance(f.id, tuple) else (f.id,))
+
+
+def _id_filter(ids):
+    ids = sorted(ids, key=int)
+    return IdFilter(ids[0] if len(ids) == 1 else tuple(ids))
+
+
+def _intersect_bbox(a, b):
+    s, w, n, e = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    if s > n or w > e:
+        return None
+    return (s, w, n, e)
+
+
+def optimize_filters(filters):
+    # Canonical, merged CompoundFilter for one statement's ANDed filters
+    if isinstance(filters, Filter):
+        filters = (filters,)
+    filters = tuple(dict.fromkeys(filters))
+    rest, tags = [], dict()
+    ids = bbox = None
+    for f in filters:
+        if isinstance(f, IdFilter):
+            ids = _id_values(f) if ids is None else ids & _id_values(f)
+            if not ids:
+                return CompoundFilter(filters)
+        elif isinstance(f, BboxFilter):
+            bbox = f.bbox if bbox is None else _intersect_bbox(bbox, f.bbox)
+            if bbox is None:
+                return CompoundFilter(filters)
+        elif isinstance(f, TagFilter) and _tag_values(f) is not None:
+            key, vals = f.key.key, _tag_values(f)
+            cur = tags.get(key, _EXISTS)
+            if cur is not _EXISTS:
+                vals = cur if vals is _EXISTS else cur & vals
+            if not vals:
+                return CompoundFilter(filters)
+            tags[key] = vals
+        else:
+            rest.append(f)
+    # Anything unrecognised (user filters, input sets, negations) leads, in
+    # its original order
+    out = rest
+    if ids is not None:
+        out.append(_id_filter(ids))
+    out.extend(_tag_filter(key, tags[key]) for key in sorted(tags))
+    if bbox is not None:
+        out.append(BboxFilter(bbox))
+    return CompoundFilter(out)
+
+
+def _merge_keys(stmt):
+    # Ways stmt could absorb another member: {signature: filter that varies}
+    keys = dict()
+    filters = stmt.filters.filters
+    for i, f in enumerate(filters):
+        rest = CompoundFilter(filters[:i] + filters[i + 1:])
+        if isinstance(f, IdFilter):
+            keys[('id', stmt.elmtype, rest)] = f
+        elif isinstance(f, TagFilter) and _tag_values(f) not in (None, _EXISTS):
+            keys[('tag', stmt.elmtype, f.key.key, rest)] = f
+    return keys
+
+
+def _merge(a, fa, fb, key):
+    if key[0] == 'id':
+        merged = _id_filter(_id_values(fa) | _id_values(fb))
+    else:
+        vals = _tag_values(fa) | _tag_values(fb)
+        if any(_regex_chars.search(v) for v in vals):
+            return None
+        merged = _tag_filter(key[2], vals)
+    return ElementStatement(a.elmtype, optimize_filters(key[-1].filters + (merged,)))
+
+
+def _merge_members(members):
+    out, keys_of, index = [], [], dict()
+    for m in members:
+        merged = None
+        if isinstance(m, ElementStatement):
+            for key, f in _merge_keys(m).items():
+                j = index.get(key)
+                if j is not None:
+                    merged = _merge(out[j], keys_of[j][key], f, key)
+                    if merged is not None:
+                        break
+        if merged is None:
+            out.append(m)
+            keys_of.append(_merge_keys(m) if isinstance(m, ElementStatement) else {})
+            j = len(out) - 1
+        else:
+            for old in keys_of[j]:
+                if index.get(old) == j:
+                    del index[old]
+            out[j] = merged
+            keys_of[j] = _merge_keys(merged)
+        for key in keys_of[j]:
+            index.setdefault(key, j)
+    return list(dict.fromkeys(out))
+
+
+def _flatten(stmts):
+    for s in stmts:
+        if isinstance(s, UnionQuerySet):
+            yield from _flatten(s.query_statements)
+        else:
+            yield s
+
+
+def optimize_statement(stmt):
+    if isinstance(stmt, ElementStatement):
+        return ElementStatement(stmt.elmtype, optimize_filters(stmt.filters))
+    if isinstance(stmt, UnionQuerySet):
+        members = list(dict.fromkeys(optimize_statement(s) for s in _flatten(stmt.query_statements)))
+        while True:
+            merged = _merge_members(members)
+            if len(merged) == len(members):
+                break
+            members = merged
+        if len(members) == 1:
+            return members[0]
+        return UnionQuerySet(members)
+    if isinstance(stmt, DifferenceQuerySet):
+        return DifferenceQuerySet((optimize_statement(stmt.minued), optimize_statement(stmt.subtrahend)))
+    return stmt
+
+
+def optimize(obj):
+    # Optimized copy of a filter, compound filter or query statement
+    if isinstance(obj, (Filter, CompoundFilter)):
+        return optimize_filters(obj)
+    if isinstance(obj, AbstractQueryStatement):
+        return optimize_statement(obj)
+    raise TypeError(f'''Cannot optimize {type(obj).__name__}''')
+
+
+def _bboxes(stmt):
+    if isinstance(stmt, ElementStatement):
+        return {f for f in stmt.filters if isinstance(f, BboxFilter)}
+    if isinstance(stmt, UnionQuerySet):
+        found = [_bboxes(s) for s in stmt.query_statements]
+        return set.intersection(*found) if found and all(len(b) == 1 for b in found) else set()
+    return set()
+
+
+def _strip_bbox(stmt, bbox):
+    if isinstance(stmt, ElementStatement):
+        return ElementStatement(stmt.elmtype, [f for f in stmt.filters if f is not bbox])
+    return UnionQuerySet([_strip_bbox(s, bbox) for s in stmt.query_statements])
+
+
+def lift_bbox(stmt):
+    # (stmt, bbox): when every element statement carries the same single bbox
+    # filter it is removed and returned, for use as the global [bbox:]
+    # setting, which Overpass applies to statements without their own bbox
+    found = _bboxes(stmt)
+    if len(found) != 1:
+        return stmt, None
+    bbox = found.pop()
+    return _strip_bbox(stmt, bbox), bbox.bbox
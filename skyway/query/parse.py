@@ -0,0 +1,203 @@
+import re
+import json
+import codecs
+from collections import namedtuple
+
+import numpy as np
+import shapely.ops as ops
+import shapely.geometry as geom
+
+from .. import metrics
+from .client import OverpassError
+
+
+class OverpassRuntimeError(OverpassError):
+    # The server answered 200 but reported a runtime error in "remark", e.g. a
+    # timeout or out of memory; the elements before it are incomplete.
+    pass
+
+
+Element = namedtuple('Element', ['type', 'id', 'tags', 'geometry'])
+
+_elements_regex = re.compile(r'"elements"\s*:\s*\[')
+_remark_regex = re.compile(r'"remark"\s*:\s*("(?:[^"\\]|\\.)*")')
+_ws = ' \t\n\r,'
+
+# Closed ways carrying one of these keys are areas unless tagged area=no
+AREA_KEYS = frozenset([
+    'area', 'building', 'landuse', 'natural', 'leisure', 'amenity', 'water',
+    'waterway', 'aeroway', 'place', 'boundary', 'military', 'man_made', 'shop',
+    'tourism', 'historic', 'parking', 'power', 'public_transport', 'railway',
+])
+_linear_natural = frozenset(['coastline', 'cliff', 'ridge', 'arete', 'tree_row'])
+_linear_waterway = frozenset(['river', 'stream', 'canal', 'drain', 'ditch'])
+
+
+def _chunks(source, chunk_size):
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from source
+
+
+def iter_elements(source, chunk_size=1 << 16):
+    # Yield the dicts of the "elements" array of an Overpass JSON response one
+    # at a time. source is a file-like object or an iterable of byte/str
+    # chunks (eg OverpassClient.stream); only the current element and one
+    # chunk of lookahead are held in memory.
+    return metrics.timed_iter('parse.elements', _iter_elements(source, chunk_size))
+
+
+def _iter_elements(source, chunk_size):
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = _chunks(source, chunk_size)
+    buf, pos = '', 0
+
+    def more():
+        nonlocal buf, pos
+        for chunk in chunks:
+            buf = buf[pos:] + (utf8.decode(chunk) if isinstance(chunk, bytes) else chunk)
+            pos = 0
+            return True
+        return False
+
+    while True:
+        m = _elements_regex.search(buf)
+        if m is not None:
+            pos = m.end()
+            break
+        # Keep a bounded tail: enough to match a key split across chunks or
+        # to find a remark in a response that has no elements
+        buf, pos = buf[-4096:], 0
+        if not more():
+            _check_remark(buf)
+            return
+
+    while True:
+        while pos < len(buf) and buf[pos] in _ws:
+            pos += 1
+        if pos == len(buf):
+            if not more():
+                raise OverpassError("Truncated response: elements array not closed")
+            continue
+        if buf[pos] == ']':
+            break
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not more():
+                raise
+            continue
+        pos = end
+        yield obj
+
+    # Whatever follows the array is small; it may hold an error remark
+    buf, pos = buf[pos + 1:], 0
+    while more():
+        pass
+    _check_remark(buf)
+
+
+def _check_remark(text):
+    m = _remark_regex.search(text)
+    if m is None:
+        return
+    remark = json.loads(m.group(1))
+    if 'error' in remark.lower():
+        raise OverpassRuntimeError(remark)
+
+
+def _coords(points):
+    return np.array([(p['lon'], p['lat']) for p in points if p is not None], dtype=float)
+
+
+def _is_area(tags, coords):
+    if len(coords) < 4 or not np.array_equal(coords[0], coords[-1]):
+        return False
+    if tags.get('area') == 'no':
+        return False
+    if tags.get('natural') in _linear_natural or tags.get('waterway') in _linear_waterway:
+        return False
+    return bool(AREA_KEYS.intersection(tags))
+
+
+def _way_geometry(el, tags):
+    coords = _coords(el.get('geometry', ()))
+    if len(coords) < 2:
+        return None
+    if _is_area(tags, coords):
+        return geom.Polygon(coords)
+    return geom.LineString(coords)
+
+
+def _relation_geometry(el, tags):
+    lines = {'outer': [], 'inner': []}
+    parts = []
+    for member in el.get('members', ()):
+        if member['type'] == 'node' and 'lat' in member:
+            parts.append(geom.Point(member['lon'], member['lat']))
+        elif member['type'] == 'way':
+            coords = _coords(member.get('geometry', ()))
+            if len(coords) < 2:
+                continue
+            line = geom.LineString(coords)
+            role = member.get('role')
+            if role in lines:
+                lines[role].append(line)
+            else:
+                parts.append(line)
+    if tags.get('type') in ('multipolygon', 'boundary') and lines['outer']:
+        with metrics.span('geom.unary_union'):
+            outer = ops.unary_union(list(ops.polygonize(lines['outer'])))
+            if lines['inner']:
+                outer = outer.difference(ops.unary_union(list(ops.polygonize(lines['inner']))))
+        parts.insert(0, outer)
+    else:
+        parts.extend(lines['outer'] + lines['inner'])
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return geom.GeometryCollection(parts)
+
+
+def element_geometry(el):
+    # Shapely geometry of an `out geom` element, None if it carries none
+    tags = el.get('tags', {})
+    if el['type'] == 'node':
+        return geom.Point(el['lon'], el['lat']) if 'lat' in el else None
+    if el['type'] == 'way':
+        return _way_geometry(el, tags)
+    if el['type'] == 'relation':
+        return _relation_geometry(el, tags)
+    return None
+
+
+def element_coords(el):
+    # Compact form: an (N, 2) lon/lat array for nodes and ways, and a list of
+    # (role, array) pairs for relation members
+    if el['type'] == 'node':
+        return np.array([[el['lon'], el['lat']]], dtype=float) if 'lat' in el else None
+    if el['type'] == 'way':
+        return _coords(el.get('geometry', ()))
+    if el['type'] == 'relation':
+        return [(m.get('role'), _coords(m['geometry']) if 'geometry' in m
+                 else np.array([[m['lon'], m['lat']]], dtype=float))
+                for m in el.get('members', ()) if 'geometry' in m or 'lat' in m]
+    return None
+
+
+def iter_features(source, arrays=False, chunk_size=1 << 16):
+    # Stream Elements with a shapely geometry, or coordinate arrays when
+    # arrays=True. Elements without geometry (eg `out ids`) are skipped.
+    convert = element_coords if arrays else element_geometry
+    for el in iter_elements(source, chunk_size=chunk_size):
+        g = convert(el)
+        if g is None:
+            continue
+        yield Element(el['type'], el['id'], el.get('tags', {}), g)
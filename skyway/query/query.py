@@ -1,5 +1,11 @@
+from .base import ElementStatement
 from .filters import BboxFilter, TagFilter, IdFilter
+from .settings import QuerySettings
+from .client import OVERPASS_ENDPOINTS, default_client
+from .parse import iter_features
+from .optimize import optimize_statement, lift_bbox
 
+import copy
 import datetime
 from dateutil.parser import parse as dateparse
 
@@ -20,27 +26,69 @@ class NWR(ElementQuery):
     def add_tagfilter(self, tf):
         self.filters.append(tf)
 
+    @property
+    def statement(self):
+        return ElementStatement("nwr", self.filters)
+
     def __repr__(self):
-        return f'''nwr{self.filters};'''
+        return f'''nwr{"".join(f._fmt() for f in self.filters)};'''
 
 
 class QueryBuilder:
-    overpass_endpoint = 'http://overpass-api.de/api/interpreter'
+    overpass_endpoint = OVERPASS_ENDPOINTS[0]
+    client = None
+    # Run the optimizer pass (see optimize.py) on queries before submission
+    optimize = True
     def __init__(self, name="default"):
         self.name = name
         self.settings = QuerySettings()
         self.queries = None
 
+    def _client(self, client=None):
+        return client or self.client or default_client()
+
 
 
 
 class GeomQueryBuilder(QueryBuilder):
     def __init__(self, bbox=None):
         self.settings = QuerySettings(payload_format="json", bbox=bbox)
-        self.queries = NWR()
+        self.query = NWR()
 
     def __repr__(self):
         return f'''{self.settings}{self.query}out geom;'''
 
-    def request(self):
-        return requests.get(self.overpass_endpoint, data=repr(self))
+    def optimized(self):
+        # Copy with merged filters and any statement bbox lifted into the
+        # global bbox setting, which it overrides anyway
+        return self._rebuilt(*lift_bbox(optimize_statement(self.query.statement)))
+
+    def lifted(self):
+        # Copy with just the statement bbox lifted, when there is one
+        return self._rebuilt(*lift_bbox(self.query.statement))
+
+    def _rebuilt(self, stmt, bbox):
+        gb = copy.copy(self)
+        gb.settings = copy.deepcopy(self.settings)
+        if bbox is not None:
+            gb.settings.bbox = bbox
+        gb.query = NWR()
+        for f in stmt.filters:
+            gb.query.add_tagfilter(f)
+        return gb
+
+    def ql(self):
+        # Query text as submitted
+        return repr(self.optimized() if self.optimize else self)
+
+    def request(self, client=None):
+        return self._client(client).request(self.ql())
+
+    def stream(self, client=None, chunk_size=None):
+        return self._client(client).stream(self.ql(), chunk_size=chunk_size)
+
+    def download(self, path, client=None):
+        return self._client(client).download(self.ql(), path)
+
+    def features(self, client=None, arrays=False):
+        return iter_features(self.stream(client=client), arrays=arrays)
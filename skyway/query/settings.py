@@ -1,4 +1,4 @@
-from .base import BaseSettings
+from .base import BaseSetting
 import datetime
 from dateutil.parser import parse as dateparse
 
@@ -25,7 +25,7 @@ class Bbox(BaseSetting, param_name="bbox"):
 
     def _fmt_param(self):
         s, w, n, e = self.bbox
-        return f'''{s:.2f},{w:.2f},{n:.2f},{e:.2f}'''
+        return f'''{s:.7f},{w:.7f},{n:.7f},{e:.7f}'''
 
 
 class Date(BaseSetting, param_name="date"):
@@ -0,0 +1,238 @@
+import re
+import json
+import math
+import time
+import random
+import threading
+import multiprocessing
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+_bbox_regex = re.compile(r'\[bbox:\s*([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\s*\]')
+# make <type> <key>="<value>";out; markers followed by a statement bbox, as
+# written by TileBatchQuery
+_marker_regex = re.compile(r'make (\w+) (\w+)="([^"]*)";out;[^;]*?'
+                           r'\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)')
+
+TIMEOUT_REMARK = 'runtime error: Query timed out in "query" at line 1 after 25 seconds.'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%X\r\n%s\r\n' % (len(data), data))
+
+    def _reply(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _query(self):
+        if self.command == 'POST':
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+            form = parse_qs(body)
+            return form['data'][0] if 'data' in form else body
+        return parse_qs(urlparse(self.path).query).get('data', [''])[0]
+
+    def _interpreter(self):
+        srv = self.server.standin
+        query = self._query()
+        status, remark = srv._outcome(query)
+        if srv.latency:
+            time.sleep(srv._latency())
+        if status == 429:
+            return self._reply(429, b'rate limited', [('Retry-After', str(srv.retry_after))])
+        if status != 200:
+            return self._reply(status, b'gateway timeout')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        body = srv._body(query, remark)
+        for i in range(0, len(body), 1 << 16):
+            self._write_chunk(body[i:i + (1 << 16)])
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _status(self):
+        self._reply(200, b'Connected as: 0\nRate limit: 2\n2 slots available now.\n')
+
+    def _route(self):
+        path = urlparse(self.path).path
+        if path.endswith('/interpreter'):
+            return self._interpreter()
+        if path.endswith('/status'):
+            return self._status()
+        self._reply(404, b'not found')
+
+    do_GET = _route
+    do_POST = _route
+
+
+class OverpassStandin:
+    # Local stand-in for an Overpass interpreter for tests and benchmarks.
+    # Every query gets a deterministic synthetic `out geom` JSON payload of
+    # the elements (a mix of nodes and ways of way_nodes points) in the
+    # query's [bbox:...]. Elements sit on a global lattice, one per cell, at
+    # a density of `elements` per 0.1 x 0.1 degree box; ids come from the
+    # cell, so overlapping queries see the same elements and ways crossing
+    # a bbox edge are returned to both sides, as a real server would do.
+    # latency seconds
+    # (plus up to jitter) are added per request, and error_rate maps status
+    # codes (429, 504) or "remark" to the fraction of requests that fail that
+    # way. Use as a context manager; endpoint is the interpreter url.
+
+    def __init__(self, elements=1000, way_nodes=8, latency=0.0, jitter=0.0,
+                 error_rate=None, retry_after=0, seed=0, host='127.0.0.1', port=0):
+        self.elements = elements
+        self.way_nodes = way_nodes
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = dict(error_rate or {})
+        self.retry_after = retry_after
+        self.seed = seed
+        self._step = 0.1 / elements ** 0.5 if elements else None
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._bodies = OrderedDict()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f'''http://{host}:{port}/api/interpreter'''
+
+    def _latency(self):
+        with self._lock:
+            return self.latency + self._rnd.random() * self.jitter
+
+    def _outcome(self, query):
+        with self._lock:
+            self.requests += 1
+            u = self._rnd.random()
+            for outcome, rate in self.error_rate.items():
+                if u < rate:
+                    self.errors += 1
+                    if outcome == 'remark':
+                        return 200, TIMEOUT_REMARK
+                    return outcome, None
+                u -= rate
+        return 200, None
+
+    def payload(self, query, remark=None):
+        # Yields the JSON body in pieces; identical for identical queries.
+        # Batched scripts get each marker followed by that tile's elements.
+        yield b'{"version":0.6,"generator":"skyway standin","elements":['
+        markers = _marker_regex.findall(query)
+        if markers:
+            for k, (mtype, key, value, *bbox) in enumerate(markers):
+                marker = {"type": mtype, "id": k + 1, "tags": {key: value}}
+                yield (b',' if k else b'') + json.dumps(marker, separators=(',', ':')).encode('utf-8')
+                for el in self._elements(*map(float, bbox)):
+                    yield b',' + el
+        else:
+            m = _bbox_regex.search(query)
+            s, w, n, e = map(float, m.groups()) if m else (0.0, 0.0, 0.1, 0.1)
+            for i, el in enumerate(self._elements(s, w, n, e)):
+                yield (b',' if i else b'') + el
+        if remark is not None:
+            yield b'],"remark":' + json.dumps(remark).encode('utf-8') + b'}'
+        else:
+            yield b']}'
+
+    def _elements(self, s, w, n, e):
+        if self._step is None:
+            return
+        step = self._step
+        # Ways run up and to the right of their anchor, so cells that far
+        # below and left of the bbox can reach into it
+        reach = (self.way_nodes - 1) * 1e-4
+        cols = range(math.floor((w - reach) / step), math.floor(e / step) + 1)
+        for i in range(math.floor((s - reach) / step), math.floor(n / step) + 1):
+            for j in cols:
+                rnd = random.Random((i << 32) ^ (j & 0xFFFFFFFF) ^ (self.seed << 1))
+                lat, lon = (i + rnd.random()) * step, (j + rnd.random()) * step
+                eid = ((i + (1 << 30)) << 31) | (j + (1 << 30))
+                if rnd.random() < 0.75:
+                    if not (s <= lat <= n and w <= lon <= e):
+                        continue
+                    el = {"type": "node", "id": eid, "lat": round(lat, 7), "lon": round(lon, 7),
+                          "tags": {"amenity": "bench"}}
+                else:
+                    points = [(lat + k * 1e-4, lon + k * 1e-4) for k in range(self.way_nodes)]
+                    if not any(s <= y <= n and w <= x <= e for y, x in points):
+                        continue
+                    el = {"type": "way", "id": eid, "tags": {"highway": "residential"},
+                          "geometry": [{"lat": round(y, 7), "lon": round(x, 7)} for y, x in points]}
+                yield json.dumps(el, separators=(',', ':')).encode('utf-8')
+
+    def _body(self, query, remark):
+        # Payloads are deterministic, so the last few are kept to keep the
+        # server cheap relative to the client being measured
+        key = (query, remark)
+        with self._lock:
+            body = self._bodies.get(key)
+        if body is None:
+            body = b''.join(self.payload(query, remark=remark))
+            with self._lock:
+                self._bodies[key] = body
+                while len(self._bodies) > 8:
+                    self._bodies.popitem(last=False)
+        return body
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def _serve(conn, kwargs):
+    srv = OverpassStandin(**kwargs).start()
+    conn.send(srv.endpoint)
+    conn.recv()
+    srv.stop()
+
+
+class StandinProcess:
+    # OverpassStandin in a child process, so a benchmark measures only the
+    # client side. Takes the same arguments as OverpassStandin.
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.endpoint = None
+        self._conn = None
+        self._proc = None
+
+    def __enter__(self):
+        self._conn, child = multiprocessing.Pipe()
+        self._proc = multiprocessing.Process(target=_serve, args=(child, self.kwargs), daemon=True)
+        self._proc.start()
+        self.endpoint = self._conn.recv()
+        return self
+
+    def __exit__(self, *args):
+        self._conn.send(None)
+        self._proc.join(timeout=10)
@@ -0,0 +1,112 @@
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+import rasterio
+from rasterio.windows import Window
+
+
+# GDAL settings for reading COGs over a network filesystem: no directory
+# listing on open, range merging, and a shared block / VSI cache so repeated
+# reads of nearby windows are served from memory
+GDAL_ENV = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.tiff,.TIF,.TIFF",
+    "GDAL_HTTP_MULTIRANGE": "YES",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MAX_RETRY": 3,
+    "GDAL_HTTP_RETRY_DELAY": 1,
+    "VSI_CACHE": True,
+    "VSI_CACHE_SIZE": 64 << 20,
+    "GDAL_CACHEMAX": 512,
+    "GDAL_BAND_BLOCK_CACHE": "HASHSET",
+}
+
+
+class DatasetPool(object):
+    # Bounded LRU pool of open rasterio datasets keyed on (path, overview).
+    # A dataset is used by one thread at a time: acquire() hands out an idle
+    # handle for the key or opens a new one, and release() returns it. At
+    # most max_open idle handles are kept; the least recently used are
+    # closed first. Opening with an overview level makes GDAL read only that
+    # level of the COG.
+
+    def __init__(self, max_open=64, env=None):
+        self.max_open = max_open
+        self.env = dict(GDAL_ENV if env is None else env)
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _env(self):
+        return rasterio.Env(**self.env)
+
+    def acquire(self, path, overview=None):
+        key = (path, overview)
+        with self._lock:
+            handles = self._idle.get(key)
+            if handles:
+                self.reused += 1
+                ds = handles.pop()
+                if not handles:
+                    del self._idle[key]
+                return ds
+            self.opened += 1
+        kwargs = dict() if overview is None else dict(overview_level=overview)
+        with self._env():
+            return rasterio.open(path, **kwargs)
+
+    def release(self, path, ds, overview=None):
+        key = (path, overview)
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(ds)
+            self._idle.move_to_end(key)
+            count = sum(len(h) for h in self._idle.values())
+            while count > self.max_open:
+                k, handles = next(iter(self._idle.items()))
+                evicted.append(handles.pop(0))
+                if not handles:
+                    del self._idle[k]
+                count -= 1
+        for old in evicted:
+            old.close()
+
+    @contextmanager
+    def dataset(self, path, overview=None):
+        ds = self.acquire(path, overview)
+        try:
+            yield ds
+        except Exception:
+            ds.close()
+            raise
+        else:
+            self.release(path, ds, overview)
+
+    def read(self, path, window=None, bounds=None, overview=None, indexes=None, out_shape=None):
+        # Read window (a rasterio Window or (col_off, row_off, width, height)
+        # at the overview's resolution), or the window covering bounds in the
+        # dataset crs, or the whole level. A (rows, cols) out_shape resamples
+        # every band read to that size.
+        with self.dataset(path, overview) as ds:
+            if bounds is not None:
+                window = ds.window(*bounds)
+            elif window is not None and not isinstance(window, Window):
+                window = Window(*window)
+            if out_shape is not None and len(out_shape) == 2 and not isinstance(indexes, int):
+                count = ds.count if indexes is None else len(indexes)
+                out_shape = (count,) + tuple(out_shape)
+            with self._env():
+                return ds.read(indexes=indexes, window=window, out_shape=out_shape)
+
+    def close(self):
+        with self._lock:
+            handles = [ds for hs in self._idle.values() for ds in hs]
+            self._idle.clear()
+        for ds in handles:
+            ds.close()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(h) for h in self._idle.values())
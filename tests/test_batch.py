@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from skyway.query.batch import TileBatchExecutor
+from skyway.query.client import OverpassClient, OverpassError
+from skyway.query.query import GeomQueryBuilder
+from skyway.query.standin import OverpassStandin
+
+
+TILES = {f'''q{i}''': (40.0, -70.0 + 0.01 * i, 40.01, -69.99 + 0.01 * i) for i in range(8)}
+
+
+class FailFirst:
+    # Lets the first request meet the stand-in's errors and no later one
+    def __init__(self, srv):
+        self.srv = srv
+        self.client = OverpassClient(srv.endpoint, max_retries=0)
+
+    def stream(self, query, **kwargs):
+        try:
+            yield from self.client.stream(query, **kwargs)
+        finally:
+            self.srv.error_rate = {}
+
+
+@pytest.mark.parametrize("outcome, requests", [("remark", 2), (504, 3)])
+def test_failed_batches_requeue_unfinished_tiles(outcome, requests):
+    # A remark ends the response after every tile but the last, a 504
+    # before any; either way the rest are requeued in half-size batches
+    with OverpassStandin(elements=100, error_rate={outcome: 1.0}) as srv:
+        ex = TileBatchExecutor(client=FailFirst(srv), max_workers=1, initial_batch=8)
+        results = list(ex.run(GeomQueryBuilder(), TILES))
+        assert sorted(qk for qk, _ in results) == sorted(TILES)
+        for qk, elements in results:
+            assert elements == [json.loads(el) for el in srv._elements(*TILES[qk])]
+        assert ex.failed == [8]
+        assert ex.requests == srv.requests == requests
+        assert ex.batch_size(GeomQueryBuilder()) <= 4
+
+
+def test_single_tile_failures_raise():
+    with OverpassStandin(elements=100, error_rate={"remark": 1.0}) as srv:
+        ex = TileBatchExecutor(client=OverpassClient(srv.endpoint, max_retries=0), max_workers=1,
+                               initial_batch=1)
+        with pytest.raises(OverpassError):
+            list(ex.run(GeomQueryBuilder(), {"q0": TILES["q0"]}))
+
@@ -0,0 +1,78 @@
+import os
+import time
+
+from skyway.query.cache import ResponseCache, canonical_query
+from skyway.query.client import OverpassClient
+from skyway.query.standin import OverpassStandin
+
+
+def test_canonical_query_ignores_layout():
+    assert canonical_query('[out:json];\n  node( 1 ) ; // c\nout;') == canonical_query('[out:json];node(1);out;')
+    assert canonical_query('node["a b"];') != canonical_query('node["ab"];')
+
+
+def test_hit_miss_and_disk_tier(tmp_path):
+    cache = ResponseCache(path=str(tmp_path))
+    assert cache.get("node(1);out;") is None
+    cache.put("node(1);out;", b"body")
+    assert cache.get("node(1); out;") == b"body"
+    # A fresh instance only has the disk tier
+    cache = ResponseCache(path=str(tmp_path))
+    assert cache.get("node(1);out;") == b"body"
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_memory_tier_ttl_and_invalidate():
+    cache = ResponseCache(path=None, ttl=0.05)
+    cache.put("node(1);out;", b"one")
+    cache.put("node(2);out;", b"two")
+    cache.invalidate("node(2); out;")
+    assert cache.get("node(1);out;") == b"one"
+    assert cache.get("node(2);out;") is None
+    time.sleep(0.1)
+    assert cache.get("node(1);out;") is None
+
+
+def test_client_serves_repeated_queries_from_the_cache():
+    query = "[out:json][bbox:40.0,-70.0,40.01,-69.99];nwr;out geom;"
+    with OverpassStandin(elements=100) as srv:
+        client = OverpassClient(srv.endpoint, cache=ResponseCache(path=None))
+        body = b"".join(client.stream(query))
+        assert b"".join(client.stream(query)) == body
+        assert client.request(query).content == body
+        assert srv.requests == 1
+        client.cache.invalidate(query)
+        assert b"".join(client.stream(query)) == body
+        assert srv.requests == 2
+
+
+def test_expired_entries_are_deleted(tmp_path):
+    cache = ResponseCache(path=str(tmp_path), ttl=0.05)
+    cache.put("node(1);out;", b"body")
+    cache.put("[date:\"2020-01-01T00:00:00Z\"];node(1);out;", b"pinned")
+    time.sleep(0.1)
+    assert cache.get("node(1);out;") is None
+    assert cache.get("[date:\"2020-01-01T00:00:00Z\"];node(1);out;") == b"pinned"
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_prune_keeps_disk_under_cap(tmp_path):
+    cache = ResponseCache(path=str(tmp_path), max_items=0, max_disk_bytes=4096)
+    for i in range(10):
+        cache.put(f'''node({i});out;''', b"x" * 1000)
+        os.utime(cache._file(cache.key(f'''node({i});out;''')), (i, i))
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) <= 4096
+    assert cache.get("node(9);out;") is not None
+    assert cache.get("node(0);out;") is None
+
+
+def test_invalidate_spares_writers_in_flight(tmp_path):
+    cache = ResponseCache(path=str(tmp_path))
+    cache.put("node(1);out;", b"body")
+    writer = cache.writer("node(2);out;")
+    writer.write(b"partial")
+    cache.invalidate()
+    assert cache.get("node(1);out;") is None
+    writer.write(b" rest")
+    writer.commit()
+    assert cache.get("node(2);out;") == b"partial rest"
@@ -0,0 +1,125 @@
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_bounds
+import tiletanic as tt
+from pyproj import Transformer
+from shapely.geometry import box
+
+pytest.importorskip("canvas")
+
+from skyway.canvas import CanvasCollection, TileArray, WORLD_CRS
+from skyway.export import write_geojson
+from skyway.manifest import CoverageManifest
+
+
+ZONE = 19
+
+
+def _write_cog(path, bounds, crs, size=64):
+    data = np.arange(size * size, dtype=np.uint16).astype('uint8').reshape(1, size, size)
+    with rasterio.open(path, 'w', driver='GTiff', width=size, height=size, count=1, dtype='uint8',
+                       crs=crs, transform=from_bounds(*bounds, size, size)) as dst:
+        dst.write(data)
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    # Four adjacent tiles in zone 19: AAA covers all of them, BBB only the
+    # first
+    tiler = tt.tileschemes.WNUTM5kmTiling()
+    x0, y0 = tiler._x(500000, tiler.zoom), tiler._y(4500000, tiler.zoom)
+    quadkeys = [tiler.quadkey(tt.base.Tile(x0 + i, y0, tiler.zoom)) for i in range(4)]
+    for i, qk in enumerate(quadkeys):
+        qk_dir = tmp_path / str(ZONE) / qk
+        qk_dir.mkdir(parents=True)
+        for catid in (("AAA", "BBB") if i == 0 else ("AAA",)):
+            open(os.path.join(qk_dir, f'''{catid}-0.tif'''), 'w').close()
+    tc = CanvasCollection(bucket=str(tmp_path)).zone(ZONE)
+    tc.tile_cogs
+    for (qk, catid), paths in tc._cog_paths.items():
+        for path in paths:
+            _write_cog(path, tc[qk].utm_bounds, tc.tiler._crs_n)
+    return str(tmp_path), quadkeys
+
+
+def test_chips_for_catid_skip_tiles_it_does_not_cover(bucket):
+    root, quadkeys = bucket
+    tc = CanvasCollection(bucket=root).zone(ZONE)
+    zoom = len(quadkeys[0]) + 1
+    chips = list(tc.chips(zoom, catid="BBB"))
+    assert len(chips) == 4
+    assert {c.catid for c in chips} == {"BBB"}
+    assert {c.quadkey[:-1] for c in chips} == {quadkeys[0]}
+    chips = list(tc.chips(zoom, catid="BBB", quadkeys=quadkeys[1:]))
+    assert chips == []
+
+
+def test_chips_for_every_catid(bucket):
+    root, quadkeys = bucket
+    tc = CanvasCollection(bucket=root).zone(ZONE)
+    chips = list(tc.chips(len(quadkeys[0]) + 1, size=16))
+    assert len(chips) == 5 * 4
+    assert all(c.image.shape == (1, 16, 16) for c in chips)
+
+
+def test_chips_prefetch_must_be_positive(bucket):
+    root, quadkeys = bucket
+    tc = CanvasCollection(bucket=root).zone(ZONE)
+    with pytest.raises(ValueError):
+        list(tc.chips(len(quadkeys[0]) + 1, prefetch=0))
+
+
+def test_aoi_zones_include_tiles_overhanging_the_band(tmp_path):
+    # A zone 19 tile straddling the zone's western edge at -72 degrees, and
+    # an AOI over the part of it that lies in zone 18's band
+    tiler = tt.tileschemes.WNUTM5kmTiling()
+    x, y = Transformer.from_crs(4326, 32619, always_xy=True).transform(-72.0, 40.0)
+    qk = tiler.quadkey(tt.base.Tile(tiler._x(x, tiler.zoom), tiler._y(y, tiler.zoom), tiler.zoom))
+    (tmp_path / str(ZONE) / qk).mkdir(parents=True)
+    open(tmp_path / str(ZONE) / qk / "AAA-0.tif", 'w').close()
+    cc = CanvasCollection(bucket=str(tmp_path))
+    west = cc.zone(ZONE).tiles.bounds(WORLD_CRS)[0, 0]
+    assert west < -72.0
+    aoi = box((west - 72.0) / 2 - 0.001, 40.0, (west - 72.0) / 2 + 0.001, 40.001)
+    assert cc.aoi_zones(aoi) == [ZONE]
+    assert cc.tiles_intersecting(aoi, quadkeys=True) == {ZONE: [qk]}
+
+
+def test_stats_refresh_relists_zones_cached_in_the_manifest(bucket):
+    root, quadkeys = bucket
+    manifest = CoverageManifest(":memory:")
+    row = CanvasCollection(bucket=root, manifest=manifest).stats()[0]
+    assert (row['quadkeys'], row['catids'], row['tile_catids']) == (4, 2, 5)
+    open(os.path.join(root, str(ZONE), quadkeys[1], "CCC-0.tif"), 'w').close()
+    assert CanvasCollection(bucket=root, manifest=manifest).stats()[0]['catids'] == 2
+    row = CanvasCollection(bucket=root, manifest=manifest).stats(refresh=True)[0]
+    assert (row['catids'], row['tile_catids']) == (3, 6)
+
+
+def test_sidecar_only_catids_are_not_indexed(bucket):
+    root, quadkeys = bucket
+    qk_dir = os.path.join(root, str(ZONE), quadkeys[2])
+    for name in ("DDD-0.tif.aux.xml", "DDD-0.ovr", "AAA-0.tif.aux.xml"):
+        open(os.path.join(qk_dir, name), 'w').close()
+    tc = CanvasCollection(bucket=root).zone(ZONE)
+    assert sorted(tc.tile_cogs) == ["AAA", "BBB"]
+    assert tc.index.catids_of(quadkeys[2]) == ["AAA"]
+    assert tc.cog_paths(quadkeys[2], "AAA") == [os.path.join(qk_dir, "AAA-0.tif")]
+
+
+def test_export_skips_tiles_with_non_finite_coordinates(bucket, monkeypatch):
+    root, quadkeys = bucket
+    tc = CanvasCollection(bucket=root).zone(ZONE)
+    east = tc.tiles.utm_bounds[:, 2].max()
+    # Stand-in for a projection that gives up on the easternmost tile
+    monkeypatch.setattr(TileArray, '_transformer', lambda self, src, to: lambda xs, ys: (
+        np.where(xs < east, xs / 1e5, np.inf), ys / 1e5))
+    f = io.BytesIO()
+    assert write_geojson(f, [tc], chunk_size=2) == 3
+    features = json.loads(f.getvalue())["features"]
+    assert [ft["properties"]["tile_id"] for ft in features] == [f'''{ZONE}+{qk}''' for qk in quadkeys[:3]]
@@ -0,0 +1,84 @@
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from skyway.query.client import OverpassClient, OverpassError
+from skyway.query.standin import OverpassStandin
+
+
+def _response(status, body=b'', headers=None):
+    r = requests.models.Response()
+    r.status_code = status
+    r._content = body
+    r.headers.update(headers or {})
+    return r
+
+
+class ScriptedSession:
+    # Answers posts with the given responses in turn, noting when each came
+    def __init__(self, *responses, status=''):
+        self.responses = list(responses)
+        self.status = status
+        self.posts = []
+
+    def post(self, endpoint, **kwargs):
+        self.posts.append((endpoint, time.monotonic()))
+        return self.responses.pop(0)
+
+    def get(self, url, **kwargs):
+        return _response(200, self.status.encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+def _client(session, endpoints=("http://a/api/interpreter",), **kwargs):
+    kwargs.setdefault('backoff', 0.001)
+    kwargs.setdefault('max_backoff', 0.001)
+    return OverpassClient(list(endpoints), session=session, **kwargs)
+
+
+@pytest.mark.parametrize("seconds", [True, False])
+def test_retry_after_defers_the_endpoint(seconds):
+    # Seconds or an HTTP date, which rounds down to the second
+    hint = "0.2" if seconds else formatdate(time.time() + 1.2, usegmt=True)
+    session = ScriptedSession(_response(429, headers={'Retry-After': hint}), _response(200, b'ok'))
+    assert _client(session).request("node(1);out;").content == b'ok'
+    assert session.posts[1][1] - session.posts[0][1] >= 0.15
+
+
+def test_rate_limits_without_retry_after_use_the_status_slot():
+    session = ScriptedSession(_response(429), _response(200, b'ok'),
+                              status='Slot available after: 2026-01-01T00:00:01Z, in 1 seconds.')
+    assert _client(session).request("node(1);out;").content == b'ok'
+    assert session.posts[1][1] - session.posts[0][1] >= 0.9
+
+
+def test_retries_move_to_the_next_endpoint():
+    session = ScriptedSession(_response(503, headers={'Retry-After': '60'}), _response(200, b'ok'))
+    client = _client(session, endpoints=("http://a/api/interpreter", "http://b/api/interpreter"))
+    assert client.request("node(1);out;").content == b'ok'
+    assert [endpoint for endpoint, _ in session.posts] == ["http://a/api/interpreter",
+                                                           "http://b/api/interpreter"]
+
+
+def test_errors_surface_once_retries_run_out():
+    with OverpassStandin(error_rate={429: 1.0}) as srv:
+        client = OverpassClient(srv.endpoint, max_retries=2)
+        with pytest.raises(OverpassError) as e:
+            client.request("node(1);out;")
+        assert e.value.status_code == 429
+        assert srv.requests == 3
+
+
+def test_bad_requests_and_no_retry_statuses_are_not_retried():
+    session = ScriptedSession(_response(400, b'syntax error'))
+    with pytest.raises(OverpassError):
+        _client(session).request("node(1)")
+    assert len(session.posts) == 1
+    session = ScriptedSession(_response(504), _response(200, b'ok'))
+    with pytest.raises(OverpassError):
+        list(_client(session).stream("node(1);out;", no_retry=(504,)))
+    assert len(session.posts) == 1
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from skyway.query.client import OverpassClient, OverpassError
+from skyway.query.executor import SplitQueryExecutor
+from skyway.query.filters import BboxFilter, TagFilter
+from skyway.query.query import GeomQueryBuilder
+from skyway.query.standin import OverpassStandin
+
+
+class RecordingClient:
+    # Answers every query with no elements and keeps the query text
+    def __init__(self):
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def stream(self, query, **kwargs):
+        with self._lock:
+            self.queries.append(query)
+        yield b'{"version":0.6,"elements":[]}'
+
+
+def _builder(optimize):
+    gb = GeomQueryBuilder()
+    gb.optimize = optimize
+    gb.query.add_tagfilter(TagFilter("highway", vals=["primary"]))
+    gb.query.add_tagfilter(BboxFilter((40.0, -70.1, 40.1, -70.0)))
+    return gb
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+def test_statement_bbox_is_lifted_before_splitting(optimize):
+    client = RecordingClient()
+    assert list(SplitQueryExecutor(client=client, max_span=0.05).run(_builder(optimize))) == []
+    assert len(client.queries) > 1
+    assert not any("(40.0000000,-70.1000000" in q for q in client.queries)
+    assert all("[bbox:" in q for q in client.queries)
+
+
+def test_unliftable_statement_bboxes_raise():
+    gb = _builder(False)
+    gb.settings.bbox = (40.0, -70.1, 40.1, -70.0)
+    gb.query.add_tagfilter(BboxFilter((40.0, -70.05, 40.1, -70.0)))
+    with pytest.raises(ValueError):
+        list(SplitQueryExecutor(client=RecordingClient()).run(gb))
+
+
+# Inside a single tile at 0.05 degrees
+BBOX = (40.01, -70.01, 40.012, -70.008)
+
+
+def test_splittable_timeouts_are_not_retried():
+    with OverpassStandin(error_rate={504: 1.0}) as srv:
+        client = OverpassClient(srv.endpoint, max_retries=3, backoff=0.001, max_backoff=0.001)
+        ex = SplitQueryExecutor(client=client, max_span=0.05, min_span=0.05)
+        with pytest.raises(OverpassError):
+            list(ex.run(GeomQueryBuilder(bbox=BBOX)))
+        # BBOX lies in one tile at min_span, which can't be split and so
+        # is retried
+        assert srv.requests == 4
+        srv.requests = 0
+        ex = SplitQueryExecutor(client=client, max_span=0.05, min_span=0.04)
+        with pytest.raises(OverpassError):
+            list(ex.run(GeomQueryBuilder(bbox=BBOX)))
+        # Split on the first 504, then the one child under BBOX retried
+        assert len(ex.failed) == 1
+        assert srv.requests == 5
+
+
+def test_split_results_match_a_single_query():
+    # Ways crossing tile edges come back from both sides and are yielded once
+    bbox = (40.0, -70.1, 40.1, -70.0)
+    with OverpassStandin(elements=400) as srv:
+        client = OverpassClient(srv.endpoint)
+        whole = client.json(GeomQueryBuilder(bbox=bbox).ql())['elements']
+        split = list(SplitQueryExecutor(client=client, max_span=0.02).run(GeomQueryBuilder(bbox=bbox)))
+        assert srv.requests > 16
+    keys = [(el['type'], el['id']) for el in split]
+    assert len(keys) == len(set(keys))
+    assert sorted(keys) == sorted((el['type'], el['id']) for el in whole)
+
@@ -0,0 +1,37 @@
+import pickle
+
+import pytest
+
+from skyway.query.base import CompoundFilter, ElementStatement
+from skyway.query.filters import IdFilter, TagFilter
+
+
+def test_nodes_are_interned_by_type_and_value():
+    assert IdFilter(1) is IdFilter(1)
+    assert IdFilter([1, 2]) is IdFilter((1, 2))
+    assert IdFilter(1) is not IdFilter(1.0)
+    assert IdFilter(1) is not IdFilter(True)
+    assert repr(IdFilter(True)) == "(id:True)"
+    assert repr(IdFilter(1)) == "(id:1)"
+
+
+def test_long_compound_filter_pickles():
+    cf = CompoundFilter([TagFilter(f'''k{i}''', vals=["v"]) for i in range(5000)])
+    assert pickle.loads(pickle.dumps(cf)) is cf
+
+
+def test_in_place_forms_raise():
+    cf = CompoundFilter([IdFilter(1)])
+    with pytest.raises(TypeError):
+        cf.add_filter(IdFilter(2))
+    with pytest.raises(TypeError):
+        cf += IdFilter(2)
+    assert repr(cf + IdFilter(2)) == "(id:1)(id:2)"
+    nodes, ways = ElementStatement("node", [IdFilter(1)]), ElementStatement("way", [IdFilter(1)])
+    with pytest.raises(TypeError):
+        nodes.iunion(ways)
+    with pytest.raises(TypeError):
+        nodes.idifference(ways)
+    union = nodes
+    union += ways
+    assert union is nodes + ways
@@ -0,0 +1,42 @@
+from skyway.query.base import CompoundFilter, ElementStatement, UnionQuerySet
+from skyway.query.filters import BboxFilter, IdFilter, TagFilter, UserFilter
+from skyway.query.optimize import lift_bbox, optimize, optimize_filters
+
+
+def test_filters_merge_into_canonical_order():
+    cf = optimize_filters([BboxFilter((0, 0, 2, 2)), TagFilter("highway"),
+                           TagFilter("highway", vals=["primary", "secondary"]), IdFilter((1, 2, 3)),
+                           UserFilter("(if: t[\"lanes\"] > 1)"), TagFilter("highway", vals=["primary"]),
+                           IdFilter((2, 3, 4)), BboxFilter((1, 1, 3, 3)), TagFilter("highway")])
+    assert repr(cf) == '(if: t["lanes"] > 1)(id:2,3)[highway=primary](1.0000000,1.0000000,2.0000000,2.0000000)'
+    assert cf is optimize_filters(list(reversed(cf.filters)))
+
+
+def test_contradictions_are_left_as_written():
+    for filters in ([TagFilter("a", vals=["x"]), TagFilter("a", vals=["y"])],
+                    [IdFilter(1), IdFilter(2)],
+                    [BboxFilter((0, 0, 1, 1)), BboxFilter((2, 2, 3, 3))]):
+        assert optimize_filters(filters) is CompoundFilter(filters)
+
+
+def test_negations_and_regexes_are_not_merged():
+    filters = [TagFilter("!a"), TagFilter("b", vals=["x.*", "y"]), TagFilter("b", vals=["y"])]
+    assert optimize_filters(filters) is CompoundFilter(filters)
+
+
+def test_union_members_merge():
+    bench, cafe = (ElementStatement("node", [TagFilter("amenity", vals=[v])]) for v in ("bench", "cafe"))
+    way5, way3 = (ElementStatement("way", [IdFilter(i)]) for i in (5, 3))
+    union = optimize(bench + (cafe + way5) + way3 + bench)
+    assert isinstance(union, UnionQuerySet)
+    assert repr(union) == '(node[amenity~"^(bench|cafe)$"];way(id:3,5););'
+    assert optimize(bench + bench) is bench
+
+
+def test_shared_bbox_lifts():
+    bbox = BboxFilter((1, 2, 3, 4))
+    stmt, lifted = lift_bbox(ElementStatement("node", [bbox, TagFilter("a")]) + ElementStatement("way", [bbox]))
+    assert lifted == (1, 2, 3, 4)
+    assert repr(stmt) == "(node[a];way;);"
+    stmt = ElementStatement("node", [bbox]) + ElementStatement("way", [BboxFilter((0, 0, 1, 1))])
+    assert lift_bbox(stmt) == (stmt, None)
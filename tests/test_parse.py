@@ -0,0 +1,22 @@
+import io
+import json
+
+from skyway.query.parse import element_coords, element_geometry, iter_features
+
+
+def _source(elements):
+    return io.BytesIO(json.dumps({"version": 0.6, "elements": elements}).encode('utf-8'))
+
+
+def test_node_without_geometry():
+    el = {"type": "node", "id": 1, "tags": {"amenity": "bench"}}
+    assert element_geometry(el) is None
+    assert element_coords(el) is None
+
+
+def test_iter_features_skips_nodes_without_geometry():
+    elements = [{"type": "node", "id": 1, "tags": {"amenity": "bench"}},
+                {"type": "node", "id": 2, "lat": 40.0, "lon": -70.0}]
+    for arrays in (False, True):
+        features = list(iter_features(_source(elements), arrays=arrays))
+        assert [f.id for f in features] == [2]